@@ -0,0 +1,82 @@
+"""Страницы админки на большой таблице постов, комментариев и подписок.
+
+    python -m benchmarks.admin_changelist --users 5000 --posts 200000
+"""
+import argparse
+
+from benchmarks.common import (count_queries, measure, setup_django,
+                               test_database)
+
+
+def create_admin_data(users, posts, comments, follows):
+    from django.contrib.auth import get_user_model
+    from posts.seed import Seeder
+
+    Seeder(
+        users=users,
+        groups=50,
+        posts=posts,
+        comments=comments,
+        follows_per_user=max(follows // users, 1),
+    ).run()
+    return get_user_model().objects.create_superuser(
+        'admin_bench', '', 'admin_bench')
+
+
+def run(options):
+    from django.test import Client
+    from django.urls import reverse
+
+    from posts.models import Post
+
+    admin = create_admin_data(
+        options.users, options.posts, options.comments, options.follows)
+    client = Client()
+    client.force_login(admin)
+    post = Post.objects.first()
+
+    pages = (
+        ('posts', reverse('admin:posts_post_changelist')),
+        ('posts by author', reverse('admin:posts_post_changelist')
+         + f'?author_username={post.author.username}'),
+        ('post change', reverse('admin:posts_post_change', args=(post.pk,))),
+        ('comments', reverse('admin:posts_comment_changelist')),
+        ('follows', reverse('admin:posts_follow_changelist')),
+    )
+    results = []
+    for name, url in pages:
+        if client.get(url).status_code != 200:
+            # фильтра нет в этой версии админки
+            results.append((name, None, None))
+            continue
+        timing = measure(lambda: client.get(url), repeat=options.repeat)
+        with count_queries() as queries:
+            client.get(url)
+        results.append((name, timing, len(queries)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args)
+
+    print(f'{"page":<18}{"median ms":>10}{"p95 ms":>10}{"queries":>9}')
+    for name, timing, queries in results:
+        if timing is None:
+            print(f'{name:<18}{"n/a":>10}')
+            continue
+        print(f'{name:<18}{timing["median_ms"]:>10.2f}'
+              f'{timing["p95_ms"]:>10.2f}{queries:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Лента подписок: SQL-запрос, слияние списков авторов и hybrid.
+
+    python -m benchmarks.follow_feed --follows 10 1000 10000
+
+Кроме холодной и тёплой ленты замеряется первое чтение после нового
+поста одного из авторов (after post).
+
+Для слияния нужен ключ кэша на каждого автора, поэтому LocMemCache
+запускается без стандартного ограничения в 300 ключей.
+"""
+import argparse
+
+from benchmarks.common import (count_queries, measure, setup_django,
+                               test_database)
+
+ENGINES = ('sql', 'merge', 'hybrid')
+
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'follow-feed-bench',
+        'OPTIONS': {'MAX_ENTRIES': 1000000},
+    }
+}
+
+
+def create_follow_data(follows, posts_per_author):
+    from django.contrib.auth import get_user_model
+    from posts.models import Follow, Post
+
+    User = get_user_model()
+    reader = User.objects.create_user(f'feed_reader_{follows}')
+    User.objects.bulk_create(
+        User(username=f'feed_author_{follows}_{i}') for i in range(follows))
+    authors = list(User.objects.filter(
+        username__startswith=f'feed_author_{follows}_'))
+    Post.objects.bulk_create(
+        Post(text=f'пост {i}', author=author)
+        for author in authors
+        for i in range(posts_per_author)
+    )
+    Follow.objects.bulk_create(
+        Follow(user=reader, author=author) for author in authors)
+    return reader, authors[0]
+
+
+def run(follow_counts, posts_per_author, repeat):
+    from django.core.cache import cache
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from posts.models import Post
+
+    url = reverse('follow_index')
+    results = []
+    for follows in follow_counts:
+        reader, author = create_follow_data(follows, posts_per_author)
+        client = Client()
+        client.force_login(reader)
+        for engine in ENGINES:
+            with override_settings(FOLLOW_FEED_ENGINE=engine,
+                                   CACHES=BENCH_CACHES):
+                cache.clear()
+                cold = measure(lambda: client.get(url), repeat=1, warmup=0)
+                warm = measure(lambda: client.get(url), repeat=repeat)
+                with count_queries() as queries:
+                    client.get(url)
+                query_count = len(queries)
+                Post.objects.create(text='новый пост', author=author)
+                after_post = measure(
+                    lambda: client.get(url), repeat=1, warmup=0)
+                results.append(
+                    (follows, engine, cold, warm, after_post, query_count))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--follows', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--posts-per-author', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args.follows, args.posts_per_author, args.repeat)
+
+    print(f'{"follows":>8}  {"engine":<8}{"cold ms":>10}'
+          f'{"median ms":>11}{"p95 ms":>10}{"after post ms":>15}'
+          f'{"queries":>9}')
+    for follows, engine, cold, warm, after_post, queries in results:
+        print(f'{follows:>8}  {engine:<8}{cold["median_ms"]:>10.2f}'
+              f'{warm["median_ms"]:>11.2f}{warm["p95_ms"]:>10.2f}'
+              f'{after_post["median_ms"]:>15.2f}{queries:>9}')
+
+
+if __name__ == '__main__':
+    main()
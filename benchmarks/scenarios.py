@@ -0,0 +1,46 @@
+"""Сценарии нагрузочных замеров: набор страниц, которые открывает
+пользователь. Каждый сценарий - имя и функция, строящая URL по данным."""
+from django.urls import reverse
+
+AUTHENTICATED_SCENARIOS = (
+    ('index', lambda data: reverse('index')),
+    ('follow_index', lambda data: reverse('follow_index')),
+    ('profile', lambda data: reverse(
+        'profile', args=(data['author'].username,))),
+    ('post_view', lambda data: reverse(
+        'post', args=(data['author'].username, data['post'].pk))),
+)
+
+ANONYMOUS_SCENARIOS = tuple(
+    scenario for scenario in AUTHENTICATED_SCENARIOS
+    if scenario[0] != 'follow_index'
+) + (
+    ('group', lambda data: reverse('group', args=(data['group'].slug,))),
+)
+
+
+def create_scenario_data(posts=100, followers=10):
+    """Минимальный набор данных для сценариев на пустой базе."""
+    from django.contrib.auth import get_user_model
+    from posts.models import Follow, Group, Post
+
+    User = get_user_model()
+    author = User.objects.create_user('bench_author', password='bench')
+    reader = User.objects.create_user('bench_reader', password='bench')
+    group = Group.objects.create(
+        title='Замеры', slug='bench', description='Группа для замеров')
+    Post.objects.bulk_create(
+        Post(text=f'пост {i}', author=author, group=group)
+        for i in range(posts)
+    )
+    Follow.objects.create(user=reader, author=author)
+    for i in range(followers):
+        follower = User.objects.create_user(f'bench_follower_{i}')
+        Follow.objects.create(user=follower, author=author)
+
+    return {
+        'author': author,
+        'reader': reader,
+        'group': group,
+        'post': Post.objects.filter(author=author).first(),
+    }
@@ -0,0 +1,54 @@
+"""Задержка авторизованных запросов при разных хранилищах сессий.
+
+    python -m benchmarks.session_latency --repeat 100
+"""
+import argparse
+
+from benchmarks.common import (count_queries, measure, setup_django,
+                               test_database)
+
+
+def run(modes, repeat):
+    from django.conf import settings
+    from django.test import Client, override_settings
+
+    from benchmarks.scenarios import (AUTHENTICATED_SCENARIOS,
+                                      create_scenario_data)
+
+    data = create_scenario_data()
+    results = []
+    for mode in modes:
+        with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[mode]):
+            client = Client()
+            client.force_login(data['reader'])
+            for name, build_url in AUTHENTICATED_SCENARIOS:
+                url = build_url(data)
+                timing = measure(lambda: client.get(url), repeat=repeat)
+                with count_queries() as queries:
+                    client.get(url)
+                results.append((mode, name, timing, len(queries)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument(
+        '--modes', nargs='+',
+        default=['db', 'cached_db', 'signed_cookies'],
+    )
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args.modes, args.repeat)
+
+    print(f'{"session":<16}{"view":<14}{"median ms":>10}'
+          f'{"p95 ms":>10}{"queries":>9}')
+    for mode, name, timing, queries in results:
+        print(f'{mode:<16}{name:<14}{timing["median_ms"]:>10.2f}'
+              f'{timing["p95_ms"]:>10.2f}{queries:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Пропускная способность SQLite при параллельных писателях и читателях.
+
+Сравнивает настройки по умолчанию с профилем SQLITE_PRAGMAS:
+
+    python -m benchmarks.sqlite_concurrency --writers 4 --readers 8
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from posts.db import set_pragmas
+
+TUNED_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+
+SCHEMA = (
+    'CREATE TABLE posts_post ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' text TEXT NOT NULL,'
+    ' pub_date DATETIME NOT NULL,'
+    ' author_id INTEGER NOT NULL)',
+    'CREATE INDEX posts_post_author ON posts_post (author_id)',
+    'CREATE INDEX posts_post_pub_date ON posts_post (pub_date)',
+)
+
+
+def _connect(path, pragmas):
+    # timeout=0: ожидание блокировки регулируется только busy_timeout
+    connection = sqlite3.connect(path, timeout=0, isolation_level=None)
+    set_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def _prepare(path, pragmas, rows=10000):
+    connection = _connect(path, pragmas)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.execute('BEGIN')
+    connection.executemany(
+        'INSERT INTO posts_post (text, pub_date, author_id) '
+        "VALUES (?, datetime('now'), ?)",
+        ((f'пост {i}', i % 100) for i in range(rows))
+    )
+    connection.execute('COMMIT')
+    connection.close()
+
+
+def _writer(path, pragmas, deadline, results):
+    connection = _connect(path, pragmas)
+    done = errors = 0
+    while time.time() < deadline:
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'INSERT INTO posts_post (text, pub_date, author_id) '
+                "VALUES (?, datetime('now'), ?)",
+                ('новый пост', done % 100)
+            )
+            connection.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+    results.put(('write', done, errors))
+
+
+def _reader(path, pragmas, deadline, results):
+    connection = _connect(path, pragmas)
+    done = errors = 0
+    while time.time() < deadline:
+        try:
+            connection.execute(
+                'SELECT id, text FROM posts_post '
+                'ORDER BY pub_date DESC LIMIT 10'
+            ).fetchall()
+            connection.execute(
+                'SELECT COUNT(*) FROM posts_post WHERE author_id = ?',
+                (done % 100,)
+            ).fetchone()
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', done, errors))
+
+
+def run(pragmas, writers, readers, duration):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        _prepare(path, pragmas)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + duration
+        workers = [
+            multiprocessing.Process(
+                target=_writer, args=(path, pragmas, deadline, results))
+            for _ in range(writers)
+        ] + [
+            multiprocessing.Process(
+                target=_reader, args=(path, pragmas, deadline, results))
+            for _ in range(readers)
+        ]
+        for worker in workers:
+            worker.start()
+        totals = {'write': [0, 0], 'read': [0, 0]}
+        for _ in workers:
+            kind, done, errors = results.get()
+            totals[kind][0] += done
+            totals[kind][1] += errors
+        for worker in workers:
+            worker.join()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    profiles = (
+        ('default', {'busy_timeout': 5000}),
+        ('tuned', TUNED_PRAGMAS),
+    )
+    print(f'{"profile":<10}{"writes/s":>12}{"w.errors":>10}'
+          f'{"reads/s":>12}{"r.errors":>10}')
+    for name, pragmas in profiles:
+        totals = run(pragmas, args.writers, args.readers, args.duration)
+        print(
+            f'{name:<10}'
+            f'{totals["write"][0] / args.duration:>12.0f}'
+            f'{totals["write"][1]:>10}'
+            f'{totals["read"][0] / args.duration:>12.0f}'
+            f'{totals["read"][1]:>10}'
+        )
+
+
+if __name__ == '__main__':
+    main()
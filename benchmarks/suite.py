@@ -0,0 +1,271 @@
+"""Набор замеров: представления posts.urls, шаблон поста и сборка страниц.
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --compare before.json --threshold 0.2
+
+Данные создаются posts.seed с фиксированным seed, поэтому прогоны на
+разных коммитах сравнимы. С --compare команда завершается с кодом 1,
+если медиана какого-то замера выросла больше чем на threshold (и больше
+чем на --min-delta мс) или выросло число запросов.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks.common import (count_queries, measure, setup_django,
+                               test_database)
+
+ANONYMOUS = 'anon'
+AUTHENTICATED = 'auth'
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pick_data():
+    """Самый популярный автор, самый активный читатель и их окружение."""
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+    from posts.models import Group
+
+    User = get_user_model()
+    author = User.objects.annotate(
+        followers=Count('following')).order_by('-followers').first()
+    reader = (
+        User.objects
+        .exclude(pk=author.pk)
+        .annotate(follows=Count('follower'))
+        .order_by('-follows')
+        .first()
+    )
+    group = Group.objects.annotate(
+        posts_count=Count('posts')).order_by('-posts_count').first()
+    return {
+        'author': author,
+        'reader': reader,
+        'group': group,
+        'post': author.posts.first(),
+    }
+
+
+def _get(url):
+    return lambda client: client.get(url)
+
+
+def view_cases(data):
+    """URL-имя из posts.urls -> (кто открывает, функция запроса)."""
+    from django.urls import reverse
+
+    author = data['author'].username
+    post_id = data['post'].pk
+    public = (ANONYMOUS, AUTHENTICATED)
+
+    def follow_unfollow(client):
+        client.get(reverse('profile_follow', args=(author,)))
+        client.get(reverse('profile_unfollow', args=(author,)))
+
+    def like_unlike(client):
+        client.post(reverse('post_like', args=(author, post_id)))
+        client.post(reverse('post_unlike', args=(author, post_id)))
+
+    def comment(client):
+        client.post(
+            reverse('add_comment', args=(author, post_id)),
+            {'text': 'Комментарий из замера'},
+        )
+
+    return {
+        'index': (public, _get(reverse('index'))),
+        'group': (public, _get(reverse('group', args=(data['group'].slug,)))),
+        'profile': (public, _get(reverse('profile', args=(author,)))),
+        'post': (public, _get(reverse('post', args=(author, post_id)))),
+        'index_feed': (public, _get(reverse('index_feed', args=('rss',)))),
+        'group_feed': (public, _get(
+            reverse('group_feed', args=(data['group'].slug, 'atom')))),
+        'profile_feed': (
+            public, _get(reverse('profile_feed', args=(author, 'rss')))),
+        'follow_index': ((AUTHENTICATED,), _get(reverse('follow_index'))),
+        'new_post': ((AUTHENTICATED,), _get(reverse('new_post'))),
+        'drafts': (('author',), _get(reverse('drafts'))),
+        'post_edit': (
+            ('author',), _get(reverse('post_edit', args=(author, post_id)))),
+        # страница подтверждения, сам пост не удаляется
+        'post_delete': (
+            ('author',), _get(reverse('post_delete', args=(author, post_id)))),
+        # подписка и отписка, лайк и его отмена замеряются парой, чтобы
+        # не копить состояние
+        'profile_follow': ((AUTHENTICATED,), follow_unfollow),
+        'profile_unfollow': ((AUTHENTICATED,), follow_unfollow),
+        'post_like': ((AUTHENTICATED,), like_unlike),
+        'post_unlike': ((AUTHENTICATED,), like_unlike),
+        # пишет в базу, поэтому замеряется последним
+        'add_comment': ((AUTHENTICATED,), comment),
+    }
+
+
+def function_cases(data):
+    from django.template.loader import render_to_string
+    from posts.models import Post
+    from posts.paginator import FEED_INDEX
+    from posts.snapshots import get_snapshot
+    from posts.views import _prepare_post_content, _prepare_profile_content
+
+    post = Post.objects.select_related('author', 'group').get(
+        pk=data['post'].pk)
+    feed = Post.objects.select_related('author').select_related('group')
+
+    def prepare_post_content():
+        context = _prepare_post_content(feed, '2', FEED_INDEX, estimate=True)
+        # страница вычисляется лениво, как в шаблоне
+        list(context['page'])
+
+    return {
+        'template:base/post.html': lambda: render_to_string(
+            'base/post.html', {'post': post, 'user': data['reader']}),
+        'func:_prepare_post_content': prepare_post_content,
+        'func:_prepare_profile_content': lambda: _prepare_profile_content(
+            get_snapshot(data['author'].username), data['reader']),
+    }
+
+
+def _record(results, name, func, repeat):
+    timing = measure(func, repeat=repeat)
+    with count_queries() as queries:
+        func()
+    results[name] = dict(timing, queries=len(queries))
+
+
+def run(options):
+    from django.core.cache import cache
+    from django.test import Client
+    from posts import urls
+    from posts.seed import Seeder
+
+    Seeder(
+        users=options.users,
+        groups=options.groups,
+        posts=options.posts,
+        comments=options.comments,
+        follows_per_user=options.follows_per_user,
+        seed=options.seed,
+    ).run()
+    cache.clear()
+    data = pick_data()
+
+    clients = {
+        ANONYMOUS: Client(),
+        AUTHENTICATED: Client(),
+        'author': Client(),
+    }
+    clients[AUTHENTICATED].force_login(data['reader'])
+    clients['author'].force_login(data['author'])
+
+    cases = view_cases(data)
+    missing = {
+        pattern.name for pattern in urls.urlpatterns
+    } - set(cases)
+    if missing:
+        raise SystemExit(f'Нет замеров для представлений: {sorted(missing)}')
+
+    results = {}
+    for name, func in function_cases(data).items():
+        _record(results, name, func, options.repeat)
+    for url_name, (roles, request) in cases.items():
+        for role in roles:
+            client = clients[role]
+            _record(
+                results, f'view:{url_name}:{role}',
+                lambda: request(client), options.repeat)
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Строки отчёта и список регрессий относительно baseline."""
+    rows, regressions = [], []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            rows.append((name, current, None, 'новый' if baseline else ''))
+            continue
+        delta = current['median_ms'] - previous['median_ms']
+        ratio = delta / previous['median_ms'] if previous['median_ms'] else 0
+        status = ''
+        if ratio > threshold and delta > min_delta:
+            status = f'медленнее на {ratio:.0%}'
+        if current['queries'] > previous['queries']:
+            status = (status + ', ' if status else '') + (
+                f'запросов {previous["queries"]} -> {current["queries"]}')
+        if status:
+            regressions.append(name)
+        rows.append((name, current, previous, status))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--follows-per-user', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Куда сохранить результаты (JSON)')
+    parser.add_argument('--compare', help='JSON предыдущего прогона')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    parser.add_argument('--min-delta', type=float, default=0.5)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args)
+
+    report = {
+        'commit': _commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'params': {
+            name: getattr(args, name)
+            for name in ('users', 'groups', 'posts', 'comments',
+                         'follows_per_user', 'seed', 'repeat')
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as previous:
+            baseline = json.load(previous)
+        if baseline.get('params') != report['params']:
+            print('Внимание: параметры прогонов различаются')
+        baseline = baseline['results']
+    rows, regressions = compare(
+        results, baseline, args.threshold, args.min_delta)
+
+    print(f'{"case":<40}{"median ms":>10}{"p95 ms":>10}{"queries":>9}'
+          f'{"was ms":>10}  status')
+    for name, current, previous, status in rows:
+        was = f'{previous["median_ms"]:.2f}' if previous else '-'
+        print(f'{name:<40}{current["median_ms"]:>10.2f}'
+              f'{current["p95_ms"]:>10.2f}{current["queries"]:>9}'
+              f'{was:>10}  {status}')
+
+    if regressions:
+        print(f'Регрессии: {len(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,132 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 
+from . import deletion
 from .models import Group, Post, Comment, Follow
+from .paginator import estimate_count
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author',)
+class EstimatedCountPaginator(Paginator):
+    """Без фильтров число строк большой таблицы берётся по оценке."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimated = estimate_count(queryset)
+            if estimated > settings.PAGINATOR_ESTIMATE_THRESHOLD:
+                return estimated
+        return queryset.count()
+
+
+class UsernameFilter(admin.SimpleListFilter):
+    """Фильтр по имени пользователя: поле ввода вместо списка всех
+    пользователей."""
+    template = 'admin/posts/input_filter.html'
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        # без вариантов фильтр не выводится
+        return ((None, None),)
+
+    def choices(self, changelist):
+        yield {
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]),
+            'query_parts': [
+                (name, value)
+                for name, value in changelist.get_filters_params().items()
+                if name != self.parameter_name
+            ],
+        }
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                **{f'{self.field_name}__username': self.value().strip()})
+        return queryset
+
+
+class AuthorFilter(UsernameFilter):
+    title = 'автору'
+    parameter_name = 'author_username'
+    field_name = 'author'
+
+
+class FollowerFilter(UsernameFilter):
+    title = 'подписчику'
+    parameter_name = 'user_username'
+    field_name = 'user'
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # «N всего» - лишний COUNT(*) по всей таблице на каждой странице
+    show_full_result_count = False
+    # date_hierarchy без DISTINCT по всей таблице
+    change_list_template = 'admin/posts/change_list.html'
+
+
+class PostAdmin(LargeTableAdmin):
+    list_display = (
+        'pk', 'text', 'pub_date', 'author', 'published', 'likes_count',
+    )
+    list_select_related = ('author',)
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', 'published', AuthorFilter,)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group',)
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        # черновики и скрытые посты тоже; без фильтра менеджера objects
+        # число строк по-прежнему берётся по оценке
+        return Post.all_objects.all()
+
+    # пост только скрывается, комментарии и файлы удалит
+    # purge_deleted_posts, поэтому каскад не собирается и не выводится
+    def get_deleted_objects(self, objs, request):
+        # __str__ поста выводит автора
+        if isinstance(objs, QuerySet):
+            objs = objs.select_related('author')
+        objs = list(objs)
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        model_count = {self.opts.verbose_name_plural: len(objs)}
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        deletion.soft_delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        for post in queryset:
+            deletion.soft_delete(post)
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description',)
     search_fields = ('title', 'slug',)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('pk', 'author', 'post', 'text', 'created',)
+    list_select_related = ('author', 'post__author',)
     search_fields = ('text',)
-    list_filter = ('created',)
+    list_filter = ('created', AuthorFilter,)
+    date_hierarchy = 'created'
+    autocomplete_fields = ('author',)
+    raw_id_fields = ('post',)
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('pk', 'author', 'user',)
-    list_filter = ('author', 'user',)
+    list_select_related = ('author', 'user',)
+    list_filter = (AuthorFilter, FollowerFilter,)
+    autocomplete_fields = ('author', 'user',)
 
 
 admin.site.register(Group, GroupAdmin)
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+DEBUG_APPS = ('debug_toolbar',)
+DEBUG_MIDDLEWARE = ('debug_toolbar.middleware.DebugToolbarMiddleware',)
+# кэши, которые видит только один процесс
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_debug_features(app_configs, **kwargs):
+    # в dev отладочные инструменты включены намеренно
+    if getattr(settings, 'ENVIRONMENT', 'dev') == 'dev':
+        return []
+
+    errors = []
+    if settings.DEBUG:
+        errors.append(Warning(
+            'DEBUG включён вне dev-окружения.',
+            hint='Выключите DEBUG: он хранит все SQL-запросы в памяти.',
+            id='posts.W001',
+        ))
+
+    apps = [app for app in DEBUG_APPS if app in settings.INSTALLED_APPS]
+    middleware = [
+        item for item in DEBUG_MIDDLEWARE if item in settings.MIDDLEWARE
+    ]
+    if apps or middleware:
+        errors.append(Warning(
+            'Отладочные приложения подключены вне dev-окружения: '
+            f'{", ".join(apps + middleware)}.',
+            hint='Уберите их из INSTALLED_APPS и MIDDLEWARE.',
+            id='posts.W002',
+        ))
+
+    for template in settings.TEMPLATES:
+        if template.get('OPTIONS', {}).get('debug'):
+            errors.append(Warning(
+                'Отладка шаблонов включена вне dev-окружения.',
+                hint="Выставьте TEMPLATES['OPTIONS']['debug'] = False.",
+                id='posts.W003',
+            ))
+
+    return errors
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if getattr(settings, 'ENVIRONMENT', 'dev') in ('dev', 'test'):
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    # снимки профилей, подписки, id по именам и поколения кэша страниц
+    # сбрасываются при записи и живут до суток: сброс в одном процессе
+    # не дойдёт до остальных
+    return [Warning(
+        f'Кэш {backend} не общий для процессов.',
+        hint='Задайте CACHE_BACKEND и CACHE_LOCATION общего кэша '
+             '(memcached, redis), иначе другие процессы до суток '
+             'показывают устаревшие данные.',
+        id='posts.W004',
+    )]
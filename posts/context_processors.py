@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def notifications(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    # запрос к базе только если шаблон выводит счётчик
+    return {'unread_posts': SimpleLazyObject(lambda: unread_count(user))}
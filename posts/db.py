@@ -0,0 +1,32 @@
+from django.conf import settings
+
+# имена PRAGMA нельзя передать параметром запроса, поэтому
+# подставляем в SQL только известные
+SUPPORTED_PRAGMAS = (
+    'journal_mode',
+    'synchronous',
+    'mmap_size',
+    'cache_size',
+    'busy_timeout',
+    'temp_store',
+    'foreign_keys',
+)
+
+
+def set_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        if name not in SUPPORTED_PRAGMAS:
+            raise ValueError(f'Неподдерживаемая PRAGMA: {name}')
+        if not str(value).lstrip('-').isalnum():
+            raise ValueError(f'Некорректное значение PRAGMA {name}: {value}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        set_pragmas(cursor, pragmas)
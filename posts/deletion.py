@@ -0,0 +1,89 @@
+"""Удаление постов в два шага.
+
+Запрос только ставит отметку deleted_at: менеджер Post.objects её
+учитывает, поэтому пост сразу пропадает из лент, профиля и поиска по id.
+Комментарии, лайки, картинка с миниатюрами и сам пост удаляются потом
+командой purge_deleted_posts (например, из cron), комментарии и лайки -
+пачками в отдельных коротких транзакциях.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+
+from .models import Comment, Like, LikeDelta, Post
+
+
+def soft_delete(post):
+    """Скрывает пост; сигнал post_save сбрасывает кэши, где он виден."""
+    post.deleted_at = timezone.now()
+    post.save(update_fields=['deleted_at'])
+
+
+def deleted_posts():
+    return Post.all_objects.filter(
+        deleted_at__isnull=False).order_by('deleted_at', 'pk')
+
+
+def _delete_related(model, post, batch_size):
+    deleted = 0
+    while True:
+        ids = list(
+            model.objects
+            .filter(post_id=post.pk)
+            .order_by()
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        # обычным DELETE, без сигналов по каждой записи (у комментариев
+        # они есть): страницы с постом сбросятся при удалении самого поста
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE {} IN ({})'.format(
+                    connection.ops.quote_name(model._meta.db_table),
+                    connection.ops.quote_name(model._meta.pk.column),
+                    ', '.join(['%s'] * len(ids)),
+                ),
+                ids
+            )
+        deleted += len(ids)
+
+
+def _delete_image(post):
+    if not post.image:
+        return
+    # сгенерированные данные используют одну картинку в нескольких постах
+    shared = (
+        Post.all_objects
+        .filter(image=post.image.name)
+        .exclude(pk=post.pk)
+        .exists()
+    )
+    if not shared:
+        # миниатюры, их записи в хранилище sorl и исходный файл
+        delete_thumbnails(post.image)
+
+
+def purge(post, batch_size=None):
+    """Удаляет скрытый пост: комментарии, лайки, файлы, затем запись."""
+    batch_size = batch_size or settings.POST_PURGE_BATCH_SIZE
+    comments = _delete_related(Comment, post, batch_size)
+    _delete_related(Like, post, batch_size)
+    _delete_related(LikeDelta, post, batch_size)
+    _delete_image(post)
+    # сигнал post_delete сбросит счётчики, списки и ленты подписчиков
+    post.delete()
+    return comments
+
+
+def purge_deleted(limit=None, batch_size=None):
+    """Удаляет до limit скрытых постов; число постов и комментариев."""
+    posts = deleted_posts().select_related('author')
+    if limit is not None:
+        posts = posts[:limit]
+    purged = comments = 0
+    for post in posts:
+        comments += purge(post, batch_size)
+        purged += 1
+    return purged, comments
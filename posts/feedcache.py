@@ -0,0 +1,103 @@
+"""Кэш лент с защитой от одновременной перестройки (cache stampede).
+
+Значение хранится вместе со «мягким» сроком годности и временем, которое
+ушло на его построение. После мягкого срока значение ещё живёт
+FEED_CACHE_STALE_TIMEOUT секунд: перестраивает его только процесс,
+захвативший блокировку, остальные в это время получают старое значение.
+Чтобы перестройка не начиналась у всех в одну секунду, срок заранее
+сдвигается на случайную величину, пропорциональную времени построения
+(алгоритм XFetch).
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+METRICS = ('hits', 'stale', 'misses', 'rebuilds', 'early')
+# сколько ждать чужой перестройки при пустом кэше, в секундах
+WAIT_STEP = 0.05
+
+
+def _metric_key(name):
+    return f'feedcache:metrics:{name}'
+
+
+def _count(metric):
+    key = _metric_key(metric)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # ключа ещё нет; гонка здесь стоит максимум одного события
+        cache.set(key, 1, None)
+
+
+def metrics():
+    values = cache.get_many([_metric_key(name) for name in METRICS])
+    return {name: values.get(_metric_key(name), 0) for name in METRICS}
+
+
+def reset_metrics():
+    cache.delete_many([_metric_key(name) for name in METRICS])
+
+
+def _store(key, build, timeout):
+    start = time.time()
+    value = build()
+    now = time.time()
+    entry = {
+        'value': value,
+        'expires': now + timeout,
+        'delta': now - start,
+    }
+    cache.set(key, entry, timeout + settings.FEED_CACHE_STALE_TIMEOUT)
+    return value
+
+
+def _rebuild(key, build, timeout):
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, settings.FEED_CACHE_LOCK_TIMEOUT):
+        return None, False
+    try:
+        _count('rebuilds')
+        return _store(key, build, timeout), True
+    finally:
+        cache.delete(lock_key)
+
+
+def _is_fresh(entry, now):
+    # XFetch: -log(random()) > 0, так что срок только сдвигается вперёд
+    early = entry['delta'] * settings.FEED_CACHE_BETA * -math.log(
+        1.0 - random.random())
+    if now < entry['expires'] <= now + early:
+        _count('early')
+    return now + early < entry['expires']
+
+
+def get_or_build(key, build, timeout):
+    entry = cache.get(key)
+    if isinstance(entry, dict) and 'expires' in entry:
+        if _is_fresh(entry, time.time()):
+            _count('hits')
+            return entry['value']
+        value, rebuilt = _rebuild(key, build, timeout)
+        if rebuilt:
+            return value
+        # перестраивает другой процесс, отдаём старое значение
+        _count('stale')
+        return entry['value']
+
+    _count('misses')
+    value, rebuilt = _rebuild(key, build, timeout)
+    if rebuilt:
+        return value
+
+    # кэш пуст, а значение уже строит другой процесс: немного подождём
+    deadline = time.time() + settings.FEED_CACHE_WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if isinstance(entry, dict) and 'expires' in entry:
+            return entry['value']
+    return build()
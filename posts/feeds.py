@@ -0,0 +1,177 @@
+"""RSS и Atom для главной, групп и авторов.
+
+Ленты строятся из тех же запросов, что и страницы index, group_posts и
+profile (лента автора - прямо из снимка профиля), и выдают те же
+POSTS_PER_PAGE последних постов. Ответ всегда получает ETag и
+Last-Modified, запрос с совпавшим If-None-Match или If-Modified-Since -
+304. Если включён кэш страниц для анонимов, ETag берётся из поколения
+области pagecache, а ответ хранится в кэше: сбросы при новых и
+изменённых постах обновляют и ленты, а 304 отдаётся без обращений к
+базе. Без кэша страниц поколения не сбрасываются, и ETag - хэш ленты.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import parse_http_date_safe
+from django.utils.text import Truncator
+
+from . import pagecache
+from .models import Group, Post
+from .paginator import POSTS_PER_PAGE
+from .snapshots import get_snapshot
+
+FEED_TYPES = {
+    'rss': Rss201rev2Feed,
+    'atom': Atom1Feed,
+}
+
+
+class FeedKindConverter:
+    regex = '|'.join(FEED_TYPES)
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+class PostsFeed(Feed):
+    def __init__(self, kind):
+        self.feed_type = FEED_TYPES[kind]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(10)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('post', args=(item.author.username, item.pk))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние обновления на сайте'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('index')
+
+    def items(self):
+        return (
+            Post.objects
+            .select_related('author')
+            .select_related('group')
+            .all()[:POSTS_PER_PAGE]
+        )
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('group', args=(group.slug,))
+
+    def items(self, group):
+        return (
+            group.posts
+            .select_related('author')
+            .select_related('group')
+            .all()[:POSTS_PER_PAGE]
+        )
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        snapshot = get_snapshot(username)
+        if snapshot is None:
+            raise Http404
+        return snapshot
+
+    def title(self, snapshot):
+        return f'Yatube: @{snapshot["user"].username}'
+
+    def description(self, snapshot):
+        return f'Записи @{snapshot["user"].username}'
+
+    def link(self, snapshot):
+        return reverse('profile', args=(snapshot['user'].username,))
+
+    def items(self, snapshot):
+        return snapshot['posts']
+
+
+def _conditional(request, response, etag):
+    response['ETag'] = etag
+    last_modified = None
+    if response.has_header('Last-Modified'):
+        last_modified = parse_http_date_safe(response['Last-Modified'])
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response)
+
+
+def _serve(request, scope, feed, **kwargs):
+    if not pagecache.is_enabled():
+        response = feed(request, **kwargs)
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        return _conditional(request, response, etag)
+
+    version = hashlib.md5(
+        f'{pagecache.generation(scope)}:{request.get_full_path()}'.encode()
+    ).hexdigest()
+    etag = quote_etag(version)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    key = f'feeds:response:{version}'
+    cached = cache.get(key)
+    if cached is not None:
+        content, headers = cached
+        response = HttpResponse(content)
+        for header, value in headers:
+            response[header] = value
+    else:
+        response = feed(request, **kwargs)
+        cache.set(
+            key,
+            (response.content, list(response.items())),
+            settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+        )
+    return _conditional(request, response, etag)
+
+
+def index_feed(request, kind):
+    return _serve(request, pagecache.SCOPE_INDEX, IndexFeed(kind))
+
+
+def group_feed(request, slug, kind):
+    return _serve(
+        request, pagecache.group_scope(slug), GroupFeed(kind), slug=slug)
+
+
+def profile_feed(request, username, kind):
+    return _serve(
+        request, pagecache.author_scope(username), AuthorFeed(kind),
+        username=username)
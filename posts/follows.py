@@ -0,0 +1,51 @@
+"""Кэш подписок пользователя: отсортированный массив id авторов.
+
+Массив загружается из базы при первом обращении и сбрасывается при
+подписке и отписке (сигналы Follow). Сброс, а не правка массива на месте:
+две одновременные правки прочитали бы один массив, и одна из них
+потерялась бы на FOLLOW_SET_TIMEOUT. Проверка подписки - двоичный поиск,
+лента строится как author_id IN (...).
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow
+
+# 8-байтовые целые: компактнее и быстрее (де)сериализуются, чем set
+TYPECODE = 'q'
+
+
+def _key(user_id):
+    return f'follow_set:{user_id}'
+
+
+def _contains(author_ids, author_id):
+    index = bisect_left(author_ids, author_id)
+    return index < len(author_ids) and author_ids[index] == author_id
+
+
+def followed_author_ids(user_id):
+    """Отсортированный массив id авторов, на которых подписан пользователь."""
+    key = _key(user_id)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = array(TYPECODE, sorted(
+            Follow.objects
+            .filter(user_id=user_id)
+            .values_list('author_id', flat=True)
+        ))
+        cache.set(key, author_ids, settings.FOLLOW_SET_TIMEOUT)
+    return author_ids
+
+
+def is_following(user, author_id):
+    if not user.is_authenticated:
+        return False
+    return _contains(followed_author_ids(user.pk), author_id)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
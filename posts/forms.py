@@ -1,4 +1,5 @@
 from django import forms
+from django.utils import timezone
 
 from .models import Comment, Post
 
@@ -10,6 +11,39 @@ class PostForm(forms.ModelForm):
         fields = ('text', 'group', 'image')
 
 
+class PublishForm(forms.Form):
+    """Когда публиковать пост: сразу, позже или оставить черновиком.
+
+    Отдельно от PostForm, у которой ровно три поля.
+    """
+    draft = forms.BooleanField(
+        label='Сохранить черновиком', required=False)
+    publish_at = forms.DateTimeField(
+        label='Опубликовать позже',
+        required=False,
+        help_text='Например, 2024-05-01 09:00. Пусто - опубликовать сразу.'
+    )
+
+    def clean_publish_at(self):
+        publish_at = self.cleaned_data['publish_at']
+        if publish_at is not None and publish_at <= timezone.now():
+            raise forms.ValidationError('Это время уже прошло.')
+        return publish_at
+
+    def apply(self, post):
+        if self.cleaned_data['draft']:
+            post.published = False
+            post.scheduled_at = None
+        elif self.cleaned_data['publish_at'] is not None:
+            post.published = False
+            post.scheduled_at = self.cleaned_data['publish_at']
+        elif not post.published:
+            post.published = True
+            post.scheduled_at = None
+            # лента упорядочена по дате публикации, а не создания
+            post.pub_date = timezone.now()
+
+
 class CommentForm(forms.ModelForm):
 
     class Meta:
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import writebehind
+
+
+class Command(BaseCommand):
+    help = 'Применяет отложенные комментарии и подписки к базе пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.WRITE_BEHIND_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, опрашивая очередь',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, в секундах',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            applied = writebehind.apply_pending(
+                batch_size=options['batch_size'])
+            total += applied
+            if applied:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(f'Применено операций: {total}')
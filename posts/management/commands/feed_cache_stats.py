@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import feedcache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания, промахи и перестройки кэша лент'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        for name, value in feedcache.metrics().items():
+            self.stdout.write(f'{name}: {value}')
+        if options['reset']:
+            feedcache.reset_metrics()
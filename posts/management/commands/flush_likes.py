@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import likes
+
+
+class Command(BaseCommand):
+    help = 'Переносит накопленные лайки в счётчики постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.LIKE_FLUSH_BATCH_SIZE,
+            help='Сколько изменений переносить в одной транзакции',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='Повторять каждые столько секунд вместо одного запуска',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated = likes.flush(options['batch_size'])
+            self.stdout.write(f'Обновлено счётчиков: {updated}')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import publishing
+
+
+class Command(BaseCommand):
+    help = 'Публикует отложенные посты, время которых наступило'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.POST_PUBLISH_BATCH_SIZE,
+            help='Сколько постов публиковать одним запросом',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='Повторять каждые столько секунд вместо одного запуска',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            published = publishing.publish_due(
+                batch_size=options['batch_size'])
+            self.stdout.write(f'Опубликовано постов: {published}')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
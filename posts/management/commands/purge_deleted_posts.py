@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import deletion
+
+
+class Command(BaseCommand):
+    help = 'Удаляет скрытые посты вместе с комментариями и картинками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.POST_PURGE_BATCH_SIZE,
+            help='Сколько комментариев удалять в одной транзакции',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Сколько постов удалить за один запуск',
+        )
+
+    def handle(self, *args, **options):
+        posts, comments = deletion.purge_deleted(
+            options['limit'], options['batch_size'])
+        self.stdout.write(
+            f'Удалено постов: {posts}, комментариев: {comments}')
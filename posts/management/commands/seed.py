@@ -0,0 +1,67 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import User
+from posts.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, подписками, '
+        'группами, постами и комментариями для замеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного распределения популярности',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней разбросаны даты',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed_',
+            help='Префикс имён пользователей и адресов групп',
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}user').exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix!r} уже есть, задайте --prefix')
+
+        start = time.monotonic()
+        seeder = Seeder(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows_per_user=options['follows_per_user'],
+            images=options['images'],
+            alpha=options['alpha'],
+            days=options['days'],
+            seed=options['seed'],
+            prefix=prefix,
+            log=self.stdout.write,
+        )
+        seeder.run()
+        # bulk_create не отправляет сигналы, закэшированные ленты устарели
+        cache.clear()
+
+        self.stdout.write(f'Готово за {time.monotonic() - start:.1f} с')
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import notifications
+
+
+class Command(BaseCommand):
+    help = 'Рассылает сводки новых постов из подписок пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.NOTIFICATION_DIGEST_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--hours', type=int, default=24,
+            help='За сколько последних часов собирать посты',
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        sent = 0
+        for users in notifications.digest_recipients(
+                since, options['batch_size']):
+            sent += notifications.send_digests(users, since)
+
+        self.stdout.write(f'Отправлено писем: {sent}')
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-19 10:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_auto_20200826_1400'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_state', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('seen_at', models.DateTimeField(help_text='Посты подписок до этого времени считаются прочитанными.', verbose_name='Просмотр подписок')),
+                ('digest_sent_at', models.DateTimeField(blank=True, help_text='Время последнего письма со сводкой новых постов.', null=True, verbose_name='Последняя рассылка')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='author',
+            field=models.ForeignKey(help_text='Пользователь, на которого подписываются.', on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+    ]
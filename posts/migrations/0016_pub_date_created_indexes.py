@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, help_text='Время создания. По-умолчанию выставляется текущее время.', verbose_name='Время создания'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, help_text='Дата публикации. По-умолчанию выставляется текущее время.', verbose_name='Дата публикации'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_pub_date_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text='Удалённый пост скрыт, пока purge_deleted_posts не удалит его вместе с комментариями и картинкой.', null=True, verbose_name='Время удаления'),
+        ),
+    ]
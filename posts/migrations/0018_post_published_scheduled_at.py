@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-19 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='published',
+            field=models.BooleanField(default=True, editable=False, help_text='Черновики и отложенные посты видит только автор.', verbose_name='Опубликован'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='scheduled_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Время, когда publish_scheduled опубликует пост.', null=True, verbose_name='Отложен до'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Удалённый пост скрыт, пока purge_deleted_posts не удалит его вместе с комментариями и картинкой.', null=True, verbose_name='Время удаления'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='post_deleted_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(scheduled_at__isnull=False), fields=['scheduled_at'], name='post_scheduled_at_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_likes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='operation_key',
+            field=models.CharField(blank=True, editable=False, help_text='Ключ из очереди apply_write_behind: повторное применение операции не создаёт дубликат.', max_length=64, null=True, unique=True, verbose_name='Ключ операции'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.functional import cached_property
 
 User = get_user_model()
 
@@ -13,6 +14,26 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def alive(self):
+        """Без удалённых постов, но с черновиками и отложенными."""
+        return self.filter(deleted_at__isnull=True)
+
+    def published(self):
+        return self.alive().filter(published=True)
+
+    def due(self, now):
+        """Отложенные посты, время публикации которых наступило."""
+        return self.alive().filter(published=False, scheduled_at__lte=now)
+
+
+class PublishedPostManager(models.Manager.from_queryset(PostQuerySet)):
+    """Опубликованные и не удалённые посты: их видят ленты и страницы."""
+
+    def get_queryset(self):
+        return super().get_queryset().published()
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст публикации',
@@ -20,6 +41,7 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
+        db_index=True,
         help_text='Дата публикации. По-умолчанию выставляется текущее время.'
     )
     author = models.ForeignKey(
@@ -45,15 +67,72 @@ class Post(models.Model):
         verbose_name='Изображение',
         help_text='Загрузка изображения. Опционально.'
     )
+    deleted_at = models.DateTimeField(
+        'Время удаления',
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Удалённый пост скрыт, пока purge_deleted_posts не '
+                  'удалит его вместе с комментариями и картинкой.'
+    )
+
+    published = models.BooleanField(
+        'Опубликован',
+        default=True,
+        editable=False,
+        help_text='Черновики и отложенные посты видит только автор.'
+    )
+    scheduled_at = models.DateTimeField(
+        'Отложен до',
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Время, когда publish_scheduled опубликует пост.'
+    )
+    likes_count = models.PositiveIntegerField(
+        'Лайки',
+        default=0,
+        editable=False,
+        help_text='Обновляется командой flush_likes, с задержкой.'
+    )
+
+    objects = PublishedPostManager()
+    all_objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            # лента подписок и счёт новых постов: author_id IN (...)
+            # с условием и сортировкой по дате
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            # очереди purge_deleted_posts и publish_scheduled: в частичные
+            # индексы попадают только ожидающие посты, а запросы лент с
+            # deleted_at IS NULL их не выбирают
+            models.Index(
+                fields=['deleted_at'],
+                name='post_deleted_at_idx',
+                condition=models.Q(deleted_at__isnull=False)
+            ),
+            models.Index(
+                fields=['scheduled_at'],
+                name='post_scheduled_at_idx',
+                condition=models.Q(scheduled_at__isnull=False)
+            ),
+        ]
 
     def __str__(self):
         text_sample = self.text[:12]
         author = self.author
         return f'@{author}: {text_sample}'
 
+    @cached_property
+    def comment_count(self):
+        # снимок профиля подставляет готовое значение без запроса
+        return self.comments.count()
+
 
 class Comment(models.Model):
     author = models.ForeignKey(
@@ -76,8 +155,19 @@ class Comment(models.Model):
     created = models.DateTimeField(
         'Время создания',
         auto_now_add=True,
+        db_index=True,
         help_text='Время создания. По-умолчанию выставляется текущее время.'
     )
+    operation_key = models.CharField(
+        'Ключ операции',
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        help_text='Ключ из очереди apply_write_behind: повторное '
+                  'применение операции не создаёт дубликат.'
+    )
 
     class Meta:
         ordering = ('-created',)
@@ -88,6 +178,45 @@ class Comment(models.Model):
         return f'@{author}: {text_sample}'
 
 
+class Like(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пользователь',
+        help_text='Кому понравился пост.',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пост',
+        help_text='Понравившийся пост.',
+    )
+    created = models.DateTimeField('Время создания', auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'post')
+
+    def __str__(self):
+        return f'Лайк @{self.user} посту {self.post_id}'
+
+
+class LikeDelta(models.Model):
+    """Изменение счётчика лайков, ещё не перенесённое в Post.likes_count.
+
+    Лайк только добавляет строку сюда, а строка поста обновляется
+    командой flush_likes одним UPDATE на пачку изменений.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост',
+    )
+    delta = models.SmallIntegerField('Изменение')
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -111,3 +240,26 @@ class Follow(models.Model):
         user = self.user
         author = self.author
         return f'Подписка @{user} на @{author}'
+
+
+class NotificationState(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_state',
+        verbose_name='Пользователь',
+    )
+    seen_at = models.DateTimeField(
+        'Просмотр подписок',
+        help_text='Посты подписок до этого времени считаются прочитанными.'
+    )
+    digest_sent_at = models.DateTimeField(
+        'Последняя рассылка',
+        null=True,
+        blank=True,
+        help_text='Время последнего письма со сводкой новых постов.'
+    )
+
+    def __str__(self):
+        return f'Уведомления @{self.user}'
@@ -0,0 +1,155 @@
+"""Уведомления о новых постах авторов из подписок.
+
+Публикация поста ничего не пишет подписчикам: событием служит сам пост.
+Число непрочитанных считается лениво одним запросом от отметки
+NotificationState.seen_at и недолго хранится в кэше, а сводки на почту
+рассылает команда send_digests пачками пользователей.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import follows
+from .models import Follow, NotificationState, Post
+
+User = get_user_model()
+
+DIGEST_SUBJECT = 'Новые публикации в ваших подписках'
+
+
+def _unread_key(user_id):
+    return f'unread_posts:{user_id}'
+
+
+def seen_at(user):
+    value = (
+        NotificationState.objects
+        .filter(user=user)
+        .values_list('seen_at', flat=True)
+        .first()
+    )
+    return value or user.date_joined
+
+
+def followed_posts(user):
+    author_ids = follows.followed_author_ids(user.pk)
+    if len(author_ids) <= settings.FOLLOW_SET_IN_LIMIT:
+        return Post.objects.filter(author_id__in=author_ids)
+    return Post.objects.filter(author__following__user=user)
+
+
+def unread_count(user):
+    key = _unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = followed_posts(user).filter(pub_date__gt=seen_at(user)).count()
+        cache.set(key, count, settings.NOTIFICATION_UNREAD_TIMEOUT)
+    return count
+
+
+def mark_seen(user, when=None):
+    when = when or timezone.now()
+    updated = NotificationState.objects.filter(user=user).update(
+        seen_at=when)
+    if not updated:
+        NotificationState.objects.bulk_create(
+            [NotificationState(user=user, seen_at=when)],
+            ignore_conflicts=True
+        )
+    # всё до отметки прочитано, пересчитывать нечего
+    cache.set(_unread_key(user.pk), 0, settings.NOTIFICATION_UNREAD_TIMEOUT)
+
+
+def digest_recipients(since, batch_size):
+    """Пачки подписчиков с почтой, которым сводка за период ещё не ушла."""
+    users = (
+        User.objects
+        .filter(follower__isnull=False)
+        .exclude(email='')
+        .exclude(notification_state__digest_sent_at__gt=since)
+        .distinct()
+        .order_by('pk')
+    )
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def _new_posts_by_author(user_ids, since):
+    rows = (
+        Follow.objects
+        # обратная связь идёт мимо менеджера Post.objects: черновики и
+        # удалённые посты отсекаются здесь, Count учитывает тот же фильтр
+        .filter(
+            user_id__in=user_ids,
+            author__posts__pub_date__gt=since,
+            author__posts__published=True,
+            author__posts__deleted_at__isnull=True,
+        )
+        .values_list('user_id', 'author__username')
+        .annotate(posts=Count('author__posts'))
+        .order_by('user_id', 'author__username')
+    )
+    digests = defaultdict(list)
+    for user_id, username, posts in rows:
+        digests[user_id].append((username, posts))
+    return digests
+
+
+def _mark_digest_sent(users, when):
+    user_ids = [user.pk for user in users]
+    existing = set(
+        NotificationState.objects
+        .filter(user_id__in=user_ids)
+        .values_list('user_id', flat=True)
+    )
+    NotificationState.objects.filter(user_id__in=existing).update(
+        digest_sent_at=when)
+    NotificationState.objects.bulk_create(
+        [
+            NotificationState(
+                user=user, seen_at=user.date_joined, digest_sent_at=when)
+            for user in users
+            if user.pk not in existing
+        ],
+        ignore_conflicts=True
+    )
+
+
+def send_digests(users, since, connection=None):
+    """Сводки для пачки пользователей одним соединением с почтой.
+
+    Отметка о рассылке ставится всей пачке, в том числе тем, у кого за
+    период ничего не вышло: повторный запуск их уже не перебирает.
+    """
+    now = timezone.now()
+    digests = _new_posts_by_author([user.pk for user in users], since)
+    messages = [
+        EmailMessage(
+            DIGEST_SUBJECT,
+            render_to_string('posts/email/digest.txt', {
+                'user': user,
+                'authors': digests[user.pk],
+                'since': since,
+            }),
+            to=[user.email],
+        )
+        for user in users
+        if user.pk in digests
+    ]
+    sent = 0
+    if messages:
+        connection = connection or get_connection()
+        sent = connection.send_messages(messages) or 0
+    _mark_digest_sent(users, now)
+    return sent
@@ -0,0 +1,148 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Страницы группируются в области (scope): лента, группа, автор (профиль
+и все его посты), flatpages. У каждой области есть поколение; ключ
+страницы включает поколение, поэтому сброс области - это одна запись
+нового поколения, без перебора закэшированных URL.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.contrib.flatpages import views as flatpages_views
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+
+SCOPE_INDEX = 'index'
+SCOPE_FLATPAGES = 'flatpages'
+
+# куки, при которых страница может отличаться от общей
+PERSONAL_COOKIES = ('messages',)
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def _scope_for(match):
+    if match.func is flatpages_views.flatpage:
+        return SCOPE_FLATPAGES
+    if match.url_name == 'index':
+        return SCOPE_INDEX
+    if match.url_name == 'group':
+        return group_scope(match.kwargs['slug'])
+    if match.url_name in ('profile', 'post'):
+        return author_scope(match.kwargs['username'])
+    return None
+
+
+def _generation_key(scope):
+    return f'pagecache:gen:{scope}'
+
+
+def _generation_timeout():
+    return max(
+        settings.PAGE_CACHE_GENERATION_TIMEOUT,
+        settings.ANONYMOUS_PAGE_CACHE_TIMEOUT,
+    )
+
+
+def generation(scope):
+    """Текущее поколение области; меняется при каждом purge."""
+    key = _generation_key(scope)
+    value = cache.get(key)
+    if value is None:
+        value = uuid.uuid4().hex
+        # add, чтобы параллельный запрос не перетёр уже выданное поколение
+        if not cache.add(key, value, _generation_timeout()):
+            value = cache.get(key, value)
+    return value
+
+
+def is_enabled():
+    return bool(settings.ANONYMOUS_PAGE_CACHE_TIMEOUT)
+
+
+def purge(*scopes):
+    cache.set_many(
+        {_generation_key(scope): uuid.uuid4().hex for scope in scopes},
+        _generation_timeout()
+    )
+
+
+def _page_key(scope, request):
+    url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'pagecache:response:{generation(scope)}:{url}'
+
+
+def _is_anonymous(request):
+    cookies = request.COOKIES
+    if settings.SESSION_COOKIE_NAME in cookies:
+        return False
+    return not any(cookie in cookies for cookie in PERSONAL_COOKIES)
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимам сохранённую страницу до сессий, авторизации и БД."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        scope = self._cache_scope(request)
+        if scope is None:
+            return self.get_response(request)
+
+        key = _page_key(scope, request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+            # заголовки промаха, в том числе X-Frame-Options и другие
+            # заголовки безопасности из внутренних middleware
+            for header, value in headers:
+                response[header] = value
+            response['X-Page-Cache'] = 'hit'
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        response = self.get_response(request)
+        # страница зависит от cookie: другой посетитель получит другую
+        patch_vary_headers(response, ('Cookie',))
+        if self._can_store(request, response):
+            cache.set(
+                key,
+                (response.content, list(response.items())),
+                settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+            )
+            response['X-Page-Cache'] = 'miss'
+        return response
+
+    def _cache_scope(self, request):
+        if not is_enabled():
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if not _is_anonymous(request):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        return _scope_for(match)
+
+    def _can_store(self, request, response):
+        return (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            # в странице есть csrf-токен, её нельзя отдавать другим
+            and not request.META.get('CSRF_COOKIE_USED')
+        )
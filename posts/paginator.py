@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+
+from . import feedcache
+
+POSTS_PER_PAGE = 10
+
+FEED_INDEX = 'index'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def _count_key(feed):
+    return f'feed_count:{feed}'
+
+
+def invalidate_counts(*feeds):
+    cache.delete_many([_count_key(feed) for feed in feeds])
+
+
+def estimate_count(queryset):
+    """Приблизительное число строк в таблице модели без COUNT(*)."""
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    # максимальный ключ берётся из индекса и почти не отличается от
+    # числа строк, пока записи редко удаляются
+    return model._base_manager.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+
+
+def feed_count(queryset, feed=None, estimate=False):
+    """Число записей ленты: из кэша, по оценке или точным COUNT(*).
+
+    Оценка используется только для больших таблиц (estimate=True и больше
+    PAGINATOR_ESTIMATE_THRESHOLD строк): номера последних страниц там
+    всё равно никто не проверяет.
+    """
+    def count():
+        if estimate:
+            estimated = estimate_count(queryset)
+            if estimated > settings.PAGINATOR_ESTIMATE_THRESHOLD:
+                return estimated
+        return queryset.count()
+
+    if feed is None:
+        return count()
+    return feedcache.get_or_build(
+        _count_key(feed), count, settings.PAGINATOR_COUNT_TIMEOUT)
+
+
+def make_paginator(object_list, per_page, count=None):
+    paginator = Paginator(object_list, per_page)
+    if count is not None:
+        # Paginator.count - cached_property, заранее известное значение
+        # избавляет от COUNT(*) при каждом обращении к странице
+        paginator.count = count
+    return paginator
+
+
+def page_window(page, window=None):
+    """Номера страниц вокруг текущей; None обозначает пропуск.
+
+    Вместо ссылок на все страницы выводятся первая, последняя и
+    по window страниц с каждой стороны от текущей.
+    """
+    if window is None:
+        window = settings.PAGINATOR_WINDOW
+    last = page.paginator.num_pages
+    start = max(page.number - window, 1)
+    end = min(page.number + window, last)
+
+    numbers = []
+    if start > 1:
+        numbers.append(1)
+        if start > 2:
+            numbers.append(None)
+    numbers.extend(range(start, end + 1))
+    if end < last:
+        if end < last - 1:
+            numbers.append(None)
+        numbers.append(last)
+    return numbers
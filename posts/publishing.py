@@ -0,0 +1,67 @@
+"""Публикация отложенных постов.
+
+Команда publish_scheduled (например, из cron раз в минуту) выбирает
+наступившие посты по частичному индексу post_scheduled_at_idx, в нём
+только неопубликованные записи. Посты публикуются пачкой одним UPDATE,
+без сигналов по каждому посту, а счётчики, списки авторов, ленты
+подписчиков, снимки профилей и кэш страниц обновляются один раз на пачку.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import pagecache, snapshots, timeline
+from .models import Post
+from .paginator import FEED_INDEX, author_feed, group_feed, invalidate_counts
+
+
+def _due_batch(now, batch_size):
+    return list(
+        Post.all_objects
+        .due(now)
+        .order_by('scheduled_at')
+        .values_list('pk', 'author_id', 'group_id',
+                     'author__username', 'group__slug')[:batch_size]
+    )
+
+
+def _batch_published(rows, now):
+    posts = [
+        Post(pk=pk, author_id=author_id, group_id=group_id, pub_date=now)
+        for pk, author_id, group_id, _, _ in rows
+    ]
+    usernames = {row[3] for row in rows}
+    slugs = {row[4] for row in rows} - {None}
+    invalidate_counts(
+        FEED_INDEX,
+        *{author_feed(post.author_id) for post in posts},
+        *{group_feed(post.group_id) for post in posts
+          if post.group_id is not None},
+    )
+    timeline.add_posts(posts)
+    timeline.fan_out(*posts)
+    snapshots.invalidate(*usernames)
+    if pagecache.is_enabled():
+        pagecache.purge(
+            pagecache.SCOPE_INDEX,
+            *map(pagecache.author_scope, usernames),
+            *map(pagecache.group_scope, slugs),
+        )
+
+
+def publish_due(now=None, batch_size=None):
+    """Публикует посты, время которых наступило; возвращает их число."""
+    now = now or timezone.now()
+    batch_size = batch_size or settings.POST_PUBLISH_BATCH_SIZE
+    published = 0
+    while True:
+        with transaction.atomic():
+            rows = _due_batch(now, batch_size)
+            if not rows:
+                return published
+            # лента упорядочена по дате публикации, а не создания
+            Post.all_objects.filter(
+                pk__in=[row[0] for row in rows], published=False,
+            ).update(published=True, scheduled_at=None, pub_date=now)
+        _batch_published(rows, now)
+        published += len(rows)
@@ -0,0 +1,235 @@
+"""Синтетические данные для замеров: соцграф со степенным распределением.
+
+Популярность авторов убывает как 1 / rank ** alpha: немногие авторы
+собирают большую часть подписчиков, постов и комментариев, как на живом
+сайте. Число подписок пользователя распределено по Парето. Всё пишется
+через bulk_create и зависит только от seed; даты отсчитываются от
+момента запуска.
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHUNK_SIZE = 5000
+IMAGE_VARIANTS = 8
+# параметр формы распределения Парето для числа подписок
+FOLLOWS_SHAPE = 2.0
+
+
+def _chunks(objects, size=CHUNK_SIZE):
+    chunk = []
+    for obj in objects:
+        chunk.append(obj)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bulk_create(model, objects):
+    created = 0
+    with transaction.atomic():
+        for chunk in _chunks(objects):
+            model.objects.bulk_create(chunk)
+            created += len(chunk)
+    return created
+
+
+@contextmanager
+def _explicit_dates(*fields):
+    """auto_now_add перезаписал бы сгенерированные даты."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _images(rng, prefix):
+    from PIL import Image
+
+    names = []
+    for i in range(IMAGE_VARIANTS):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new('RGB', (320, 240), color).save(buffer, 'JPEG')
+        names.append(default_storage.save(
+            f'posts/{prefix}{i}.jpg', ContentFile(buffer.getvalue())))
+    return names
+
+
+class Seeder:
+    def __init__(self, users, groups, posts, comments, follows_per_user,
+                 images=0.0, alpha=1.1, days=365, seed=0, prefix='seed_',
+                 log=None):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows_per_user = follows_per_user
+        self.images = images
+        self.alpha = alpha
+        self.days = days
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.now = timezone.now()
+        self.log = log or (lambda message: None)
+
+    def _moment(self):
+        return self.now - timedelta(seconds=self.rng.uniform(
+            0, self.days * 24 * 60 * 60))
+
+    def _popular(self, population, cum_weights, k):
+        return self.rng.choices(population, cum_weights=cum_weights, k=k)
+
+    def run(self):
+        user_ids = self.create_users()
+        # ранг популярности не совпадает с порядком регистрации
+        ranked = user_ids[:]
+        self.rng.shuffle(ranked)
+        popularity = {
+            author_id: 1 / (rank + 1) ** self.alpha
+            for rank, author_id in enumerate(ranked)
+        }
+        weights = list(accumulate(popularity.values()))
+
+        group_ids = self.create_groups()
+        follows = self.create_follows(user_ids, ranked, weights)
+        post_ids = self.create_posts(ranked, weights, group_ids)
+        comments = self.create_comments(user_ids, post_ids, popularity)
+        return {
+            'users': len(user_ids),
+            'groups': len(group_ids),
+            'follows': follows,
+            'posts': len(post_ids),
+            'comments': comments,
+        }
+
+    def create_users(self):
+        password = make_password(self.prefix)
+        _bulk_create(User, (
+            User(
+                username=f'{self.prefix}user{i}',
+                email=f'{self.prefix}user{i}@example.com',
+                password=password,
+                date_joined=self._moment(),
+            )
+            for i in range(self.users)
+        ))
+        self.log(f'Пользователи: {self.users}')
+        return list(
+            User.objects
+            .filter(username__startswith=f'{self.prefix}user')
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def create_groups(self):
+        _bulk_create(Group, (
+            Group(
+                title=f'Группа {i}',
+                slug=f'{self.prefix}group{i}',
+                description=f'Сгенерированная группа {i}',
+            )
+            for i in range(self.groups)
+        ))
+        self.log(f'Группы: {self.groups}')
+        return list(
+            Group.objects
+            .filter(slug__startswith=f'{self.prefix}group')
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def create_follows(self, user_ids, ranked, weights):
+        scale = self.follows_per_user * (FOLLOWS_SHAPE - 1) / FOLLOWS_SHAPE
+
+        def edges():
+            for user_id in user_ids:
+                count = min(
+                    int(scale * self.rng.paretovariate(FOLLOWS_SHAPE)),
+                    len(user_ids) - 1,
+                )
+                authors = set(self._popular(ranked, weights, count))
+                authors.discard(user_id)
+                for author_id in sorted(authors):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        created = _bulk_create(Follow, edges())
+        self.log(f'Подписки: {created}')
+        return created
+
+    def create_posts(self, ranked, weights, group_ids):
+        images = []
+        if self.images:
+            images = _images(self.rng, self.prefix)
+        authors = self._popular(ranked, weights, self.posts)
+        first_id = (
+            Post.objects.order_by('-pk').values_list('pk', flat=True).first()
+            or 0
+        )
+
+        def posts():
+            for i, author_id in enumerate(authors):
+                group_id = None
+                if group_ids and self.rng.random() < 0.5:
+                    group_id = self.rng.choice(group_ids)
+                image = None
+                if images and self.rng.random() < self.images:
+                    image = self.rng.choice(images)
+                yield Post(
+                    text=f'Сгенерированный пост {i}',
+                    author_id=author_id,
+                    group_id=group_id,
+                    image=image,
+                    pub_date=self._moment(),
+                )
+
+        with _explicit_dates(Post._meta.get_field('pub_date')):
+            _bulk_create(Post, posts())
+        self.log(f'Посты: {self.posts}')
+        return list(
+            Post.objects
+            .filter(pk__gt=first_id)
+            .order_by('pk')
+            .values_list('pk', 'author_id', 'pub_date')
+        )
+
+    def create_comments(self, user_ids, posts, popularity):
+        if not posts:
+            return 0
+        # к постам популярных авторов пишут чаще
+        weights = list(accumulate(
+            popularity[author_id] for _, author_id, _ in posts))
+        commented = self._popular(posts, weights, self.comments)
+
+        def comments():
+            for i, (post_id, _, pub_date) in enumerate(commented):
+                yield Comment(
+                    text=f'Сгенерированный комментарий {i}',
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    created=min(self.now, pub_date + timedelta(
+                        seconds=self.rng.uniform(0, 7 * 24 * 60 * 60))),
+                )
+
+        with _explicit_dates(Comment._meta.get_field('created')):
+            created = _bulk_create(Comment, comments())
+        self.log(f'Комментарии: {created}')
+        return created
@@ -0,0 +1,213 @@
+from django.contrib.auth import get_user_model
+from django.contrib.flatpages.models import FlatPage
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import follows, pagecache, snapshots, timeline, usernames
+from .models import Comment, Follow, Group, Post
+from .paginator import (FEED_INDEX, POSTS_PER_PAGE, author_feed, group_feed,
+                        invalidate_counts)
+
+User = get_user_model()
+
+# поля пользователя, которые выводятся на страницах или служат ключами кэшей
+USER_CACHED_FIELDS = frozenset(('username', 'first_name', 'last_name'))
+
+
+def _post_feeds(post, *group_ids):
+    feeds = [FEED_INDEX, author_feed(post.author_id)]
+    feeds.extend(
+        group_feed(group_id)
+        for group_id in {post.group_id, *group_ids}
+        if group_id is not None
+    )
+    return feeds
+
+
+def _purge_post_pages(post, *group_ids):
+    if not pagecache.is_enabled():
+        return
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True)
+    pagecache.purge(
+        pagecache.SCOPE_INDEX,
+        pagecache.author_scope(post.author.username),
+        *(pagecache.group_scope(slug) for slug in slugs),
+    )
+
+
+def _index_page_key(post):
+    # скрытый пост виден только на своей странице главной; следующие лишь
+    # сдвигаются на одну запись, как и после нового поста
+    newer = Post.objects.filter(pub_date__gt=post.pub_date).count()
+    return make_template_fragment_key(
+        'index_page', [newer // POSTS_PER_PAGE + 1])
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    # при смене группы нужно сбросить счётчик и у прежней, а черновик
+    # попадает в ленты, только когда его опубликуют
+    instance._previous_group_id = None
+    instance._was_published = False
+    if instance.pk is not None:
+        instance._previous_group_id, instance._was_published = (
+            Post.all_objects
+            .filter(pk=instance.pk)
+            .values_list('group_id', 'published')
+            .first()
+        ) or (None, False)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    was_published = getattr(instance, '_was_published', False)
+    if not instance.published and not was_published:
+        # черновик не виден ни в лентах, ни в профиле
+        return
+    deleted = instance.deleted_at is not None
+    appeared = instance.published and not was_published
+    if appeared or deleted or previous_group_id != instance.group_id:
+        invalidate_counts(*_post_feeds(instance, previous_group_id))
+    if appeared:
+        timeline.add_post(instance)
+        timeline.fan_out(instance)
+    if deleted:
+        # ленты подписчиков в hybrid сбросит purge_deleted_posts, а до тех
+        # пор скрытый пост просто не найдётся при чтении страницы
+        timeline.invalidate(instance.author_id)
+        # фрагмент главной хранится готовым html, пост в нём ещё виден
+        cache.delete(_index_page_key(instance))
+    _purge_post_pages(instance, previous_group_id)
+    snapshots.build_snapshot(instance.author.username)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_counts(*_post_feeds(instance))
+    timeline.invalidate(instance.author_id)
+    timeline.invalidate_follower_timelines(instance.author_id)
+    _purge_post_pages(instance)
+    snapshots.build_snapshot(instance.author.username)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    # число комментариев выводится и в лентах, и в снимке профиля
+    snapshots.invalidate(instance.post.author.username)
+    _purge_post_pages(instance.post)
+
+
+def _group_authors(group):
+    return set(
+        Post.objects
+        .filter(group=group)
+        .values_list('author__username', flat=True)
+        .distinct()
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    # при смене адреса сбрасываются и страницы по прежнему
+    instance._previous_slug = None
+    if instance.pk is not None:
+        instance._previous_slug = (
+            Group.objects
+            .filter(pk=instance.pk)
+            .values_list('slug', flat=True)
+            .first()
+        )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    # после удаления у постов группы уже не будет
+    instance._authors = _group_authors(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # название группы выводится в постах на страницах и в снимках авторов
+    authors = getattr(instance, '_authors', None)
+    if authors is None:
+        authors = _group_authors(instance)
+    snapshots.invalidate(*authors)
+    if pagecache.is_enabled():
+        slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+        pagecache.purge(
+            pagecache.SCOPE_INDEX,
+            *map(pagecache.author_scope, authors),
+            *(pagecache.group_scope(slug) for slug in slugs if slug),
+        )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        follows.invalidate(instance.user_id)
+        timeline.invalidate_timelines(instance.user_id)
+        timeline.followers_changed(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows.invalidate(instance.user_id)
+    timeline.invalidate_timelines(instance.user_id)
+    timeline.followers_changed(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    # счётчики подписок выводятся в профиле и на страницах постов
+    usernames = (instance.author.username, instance.user.username)
+    snapshots.invalidate(*usernames)
+    if pagecache.is_enabled():
+        pagecache.purge(*map(pagecache.author_scope, usernames))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    # при переименовании сбрасывается и всё, что хранилось по старому имени
+    instance._previous_username = None
+    if instance.pk is None or (
+            update_fields is not None and 'username' not in update_fields):
+        return
+    instance._previous_username = (
+        User.objects
+        .filter(pk=instance.pk)
+        .values_list('username', flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # вход сохраняет только last_login, кэши от него не зависят
+    if update_fields is not None and not (
+            USER_CACHED_FIELDS & set(update_fields)):
+        return
+    names = {instance.username}
+    previous_username = getattr(instance, '_previous_username', None)
+    if previous_username is not None:
+        names.add(previous_username)
+    usernames.invalidate(*names)
+    snapshots.invalidate(*names)
+    if pagecache.is_enabled():
+        pagecache.purge(*map(pagecache.author_scope, names))
+
+
+@receiver(post_save, sender=FlatPage)
+@receiver(post_delete, sender=FlatPage)
+def flatpage_changed(sender, instance, **kwargs):
+    if pagecache.is_enabled():
+        pagecache.purge(pagecache.SCOPE_FLATPAGES)
@@ -0,0 +1,66 @@
+"""Готовые данные страницы автора: профиль, счётчики и первая страница.
+
+Снимок строится при записи (новый или изменённый пост) и лениво после
+сброса (подписки, комментарии, изменение пользователя). Данные конкретного
+посетителя, например кнопка подписки, в снимок не входят.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import usernames
+from .models import Comment, User
+from .paginator import POSTS_PER_PAGE
+
+
+def _key(username):
+    return f'profile_snapshot:{username}'
+
+
+def build_snapshot(username):
+    user_id = usernames.user_id(username)
+    user = None
+    if user_id is not None:
+        user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        cache.delete(_key(username))
+        return None
+
+    posts = list(
+        user.posts
+        .select_related('author')
+        .select_related('group')
+        .all()[:POSTS_PER_PAGE]
+    )
+    # число комментариев выводится у каждого поста: один запрос на
+    # страницу вместо запросов из шаблона
+    comment_counts = dict(
+        Comment.objects
+        .filter(post_id__in=[post.pk for post in posts])
+        .values_list('post_id')
+        .annotate(Count('pk'))
+        .order_by()
+    )
+    for post in posts:
+        post.comment_count = comment_counts.get(post.pk, 0)
+
+    snapshot = {
+        'user': user,
+        'post_count': user.posts.count(),
+        'follower_count': user.follower.count(),
+        'following_count': user.following.count(),
+        'posts': posts,
+    }
+    cache.set(_key(username), snapshot, settings.PROFILE_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def get_snapshot(username):
+    snapshot = cache.get(_key(username))
+    if snapshot is None:
+        snapshot = build_snapshot(username)
+    return snapshot
+
+
+def invalidate(*usernames):
+    cache.delete_many([_key(username) for username in usernames])
@@ -0,0 +1,43 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from posts import feedcache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        # ключ совпадает с ключом {% cache %}, его можно сбросить так же
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return feedcache.get_or_build(
+            key, lambda: self.nodelist.render(context), int(timeout))
+
+
+@register.tag('feedcache')
+def do_feedcache(parser, token):
+    """
+    Как {% cache %}, но с защитой от одновременной перестройки:
+
+        {% feedcache 20 index_page page.number %}...{% endfeedcache %}
+    """
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments.")
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
@@ -1,11 +1,41 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 
-from .models import Follow, Group, Post
+from yatube import profiling
+from yatube.static import StaticFilesMiddleware
+
+from . import (deletion, feedcache, follows, likes, pagecache, publishing,
+               timeline, usernames, writebehind)
+from .admin import PostAdmin
+from .checks import check_debug_features, check_shared_cache
+from .db import set_pragmas
+from .models import (Comment, Follow, Group, Like, LikeDelta,
+                     NotificationState, Post)
+from .paginator import FEED_INDEX, feed_count, make_paginator, page_window
 
 User = get_user_model()
 
@@ -16,6 +46,12 @@ DEFAULT_LAST_NAME_TEMPLATE = '{}_last_name'
 
 DEFAULT_POST_TEXT = 'текст поста'
 
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
 NOT_EXISTING_URL = '/not_existring_url/'
 FORM_TEXT_ERROR = (
     'Загрузите правильное изображение. Файл, который вы '
@@ -116,25 +152,27 @@ class PostsTestWithHelpers(TestCase):
 
 
 class PostsTest(PostsTestWithHelpers):
-    def setUp(self):
-        self.user = _create_user()
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = _create_user()
 
-        self.authorized_client = Client()
-        self.authorized_client.force_login(self.user)
-
-        self.not_authorized_client = Client()
+        cls.text_content = DEFAULT_POST_TEXT
+        cls.post = Post.objects.create(
+            text=cls.text_content, author=cls.user)
+        cls.post_context = PostContext(cls.text_content, cls.user)
 
-        self.text_content = DEFAULT_POST_TEXT
-        self.post = Post.objects.create(
-            text=self.text_content, author=self.user)
-        self.post_context = PostContext(self.text_content, self.user)
-
-        self.group = Group.objects.create(
+        cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='test_group',
             description='Тестовое описание группы'
         )
 
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+        self.not_authorized_client = Client()
+
         cache.clear()
 
     def test_404(self):
@@ -163,8 +201,8 @@ class PostsTest(PostsTestWithHelpers):
         # в html-выводе страницы нету нового поста
         self.assertNotContains(response, new_post_text)
 
-        # чистим кэш
-        key = make_template_fragment_key('index_page')
+        # чистим кэш первой страницы
+        key = make_template_fragment_key('index_page', [1])
         cache.delete(key)
 
         # делаем третий запрос
@@ -268,15 +306,10 @@ class PostsTest(PostsTestWithHelpers):
 
     def test_image_content_pages(self):
         image_post_text_content = 'пост картинкой'
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
-            b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
-            b'\x02\x4c\x01\x00\x3b'
-        )
 
         img = SimpleUploadedFile(
             name='test.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         post = Post.objects.create(
@@ -380,31 +413,36 @@ class PostsTest(PostsTestWithHelpers):
 
 
 class FollowerTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        # автор
+        cls.author_username = 'author'
+        cls.author_user = _create_user(cls.author_username)
+        cls.author_first_post_text = 'first post'
+
+        # пользователь, ни на кого не подписан
+        cls.user = _create_user()
+
+        # пользователь, подписан на автора
+        cls.follower_username = 'follower'
+        cls.follower_user = _create_user(cls.follower_username)
+        Follow.objects.create(
+            user=cls.follower_user,
+            author=cls.author_user
+        )
+
     def setUp(self):
-        # автор, авторизован
-        self.author_username = 'author'
-        self.author_user = _create_user(self.author_username)
+        cache.clear()
 
         self.author_client = Client()
         self.author_client.force_login(self.author_user)
-        self.author_first_post_text = 'first post'
-
-        # пользователь, ни на кого не подписан
-        self.user = _create_user()
 
         # авторизованный клиент пользователя
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
-        # пользователь, подписан на автора, авторизован
-        self.follower_username = 'follower'
-        self.follower_user = _create_user(self.follower_username)
         self.follower_client = Client()
         self.follower_client.force_login(self.follower_user)
-        Follow.objects.create(
-            user=self.follower_user,
-            author=self.author_user
-        )
 
     def _calculated_follow_count(self, follower, author=None):
         if author is not None:
@@ -493,3 +531,1617 @@ class FollowerTest(PostsTestWithHelpers):
             PostContext(self.author_first_post_text, self.author_user)
         ]
         self._check_paginated_page_response(response, post_contexts)
+
+
+class DebugFeaturesCheckTest(TestCase):
+    def _check_ids(self):
+        return [message.id for message in check_debug_features(None)]
+
+    @override_settings(ENVIRONMENT='dev', DEBUG=True)
+    def test_dev_is_silent(self):
+        self.assertNotIn('posts.W001', self._check_ids())
+
+    @override_settings(ENVIRONMENT='prod', DEBUG=True)
+    def test_prod_warns_about_debug(self):
+        self.assertIn('posts.W001', self._check_ids())
+
+    @override_settings(
+        ENVIRONMENT='prod',
+        MIDDLEWARE=['debug_toolbar.middleware.DebugToolbarMiddleware']
+    )
+    def test_prod_warns_about_debug_toolbar(self):
+        self.assertIn('posts.W002', self._check_ids())
+
+    @override_settings(ENVIRONMENT='prod')
+    def test_prod_warns_about_process_local_cache(self):
+        ids = [message.id for message in check_shared_cache(None)]
+        self.assertIn('posts.W004', ids)
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        }}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class SqlitePragmasTest(TestCase):
+    def _pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        self.assertEqual(self._pragma('busy_timeout'), 5000)
+        # synchronous=NORMAL
+        self.assertEqual(self._pragma('synchronous'), 1)
+
+    def test_unknown_pragma_rejected(self):
+        with connection.cursor() as cursor:
+            with self.assertRaises(ValueError):
+                set_pragmas(cursor, {'writable_schema': 1})
+            with self.assertRaises(ValueError):
+                set_pragmas(cursor, {'cache_size': '1; DROP TABLE x'})
+
+
+class WriteBehindTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = _create_user('author')
+        cls.post = Post.objects.create(
+            text=DEFAULT_POST_TEXT, author=cls.author)
+        cls.user = _create_user()
+
+    def setUp(self):
+        cache.clear()
+        self.queue_dir = tempfile.TemporaryDirectory()
+        settings_override = override_settings(
+            WRITE_BEHIND_ENABLED=True,
+            WRITE_BEHIND_QUEUE_PATH=os.path.join(
+                self.queue_dir.name, 'queue.sqlite3'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(self.queue_dir.cleanup)
+
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_follow_is_visible_before_apply(self):
+        self.client.get(reverse('profile_follow', args=('author',)))
+        self.assertFalse(Follow.objects.exists())
+
+        response = self.client.get(reverse('profile', args=('author',)))
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['following_count'], 1)
+
+        response = self.client.get(reverse('follow_index'))
+        self._check_paginated_page_response(
+            response, [PostContext(DEFAULT_POST_TEXT, self.author)])
+
+        writebehind.apply_pending()
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=self.author).exists()
+        )
+        self.assertEqual(len(writebehind.get_queue()), 0)
+
+    def test_last_follow_operation_wins(self):
+        self.client.get(reverse('profile_follow', args=('author',)))
+        self.client.get(reverse('profile_unfollow', args=('author',)))
+        self.client.get(reverse('profile_follow', args=('author',)))
+        self.assertEqual(len(writebehind.get_queue()), 1)
+
+        writebehind.apply_pending()
+        writebehind.apply_pending()
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_comment_is_visible_before_apply(self):
+        url = reverse('add_comment', args=('author', self.post.id))
+        self.client.post(url, {'text': 'отложенный комментарий'})
+        self.assertFalse(Comment.objects.exists())
+
+        response = self.client.get(
+            reverse('post', args=('author', self.post.id)))
+        self.assertContains(response, 'отложенный комментарий')
+
+        writebehind.apply_pending()
+        self.assertEqual(
+            Comment.objects.get().text, 'отложенный комментарий')
+
+    def test_operations_for_deleted_rows_are_dropped(self):
+        other = _create_user('other')
+        self.client.get(reverse('profile_follow', args=('author',)))
+        writebehind.push_follow(other, self.author.pk)
+        writebehind.push_comment(other, self.post.pk, 'комментарий')
+        other.delete()
+
+        self.assertEqual(writebehind.apply_pending(), 3)
+        self.assertEqual(len(writebehind.get_queue()), 0)
+        self.assertEqual(Follow.objects.get().user, self.user)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_is_applied_once_after_crash_before_ack(self):
+        url = reverse('add_comment', args=('author', self.post.id))
+        self.client.post(url, {'text': 'отложенный комментарий'})
+        queue = writebehind.get_queue()
+        # сбой после записи в базу, но до подтверждения в очереди
+        with mock.patch.object(queue, 'ack', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                writebehind.apply_pending(queue)
+        writebehind.apply_pending(queue)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(len(queue), 0)
+
+
+class StaticPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # collectstatic медленный, тесты только читают собранные файлы
+        cls.source = tempfile.TemporaryDirectory()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.source.cleanup)
+        cls.addClassCleanup(cls.root.cleanup)
+
+        os.makedirs(os.path.join(cls.source.name, 'css'))
+        with open(os.path.join(cls.source.name, 'css', 'site.css'), 'w') as f:
+            f.write('body { margin: 0; }\n' * 100)
+
+        with override_settings(
+            STATICFILES_DIRS=[cls.source.name],
+            STATIC_ROOT=cls.root.name,
+            STATICFILES_STORAGE=(
+                'yatube.storage.CompressedManifestStaticFilesStorage'),
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            cls.hashed_name = staticfiles_storage.stored_name('css/site.css')
+
+    def setUp(self):
+        self.middleware = StaticFilesMiddleware(
+            self._django, self.root.name, '/static/')
+
+    def _django(self, environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'django']
+
+    def _get(self, path, **headers):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+        environ.update(headers)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        response['body'] = b''.join(self.middleware(environ, start_response))
+        return response
+
+    def test_collectstatic_creates_compressed_copies(self):
+        self.assertNotEqual(self.hashed_name, 'css/site.css')
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.root.name, self.hashed_name + '.gz')))
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        response = self._get(
+            '/static/' + self.hashed_name, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['headers']['Cache-Control'])
+        self.assertEqual(
+            response['headers']['Content-Length'], str(len(response['body'])))
+
+    def test_not_modified(self):
+        etag = self._get('/static/' + self.hashed_name)['headers']['ETag']
+        response = self._get(
+            '/static/' + self.hashed_name, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['status'], '304 Not Modified')
+
+    def test_each_encoding_has_own_etag(self):
+        url = '/static/' + self.hashed_name
+        plain = self._get(url)['headers']['ETag']
+        gzipped = self._get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(gzipped['headers']['ETag'], plain)
+
+        response = self._get(
+            url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain)
+        self.assertEqual(response['status'], '200 OK')
+        response = self._get(
+            url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=f'"other", W/{gzipped["headers"]["ETag"]}')
+        self.assertEqual(response['status'], '304 Not Modified')
+        self.assertEqual(
+            response['headers']['ETag'], gzipped['headers']['ETag'])
+
+    def test_accept_encoding_qualities(self):
+        url = '/static/' + self.hashed_name
+        for accept_encoding, encoding in (
+            ('gzip;q=0', None),
+            ('br, *;q=0', None),
+            ('identity;q=0.5, gzip', 'gzip'),
+            ('identity, *;q=0', None),
+            ('*', 'gzip'),
+        ):
+            with self.subTest(accept_encoding):
+                response = self._get(
+                    url, HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(
+                    response['headers'].get('Content-Encoding'), encoding)
+
+    def test_unknown_path_goes_to_django(self):
+        response = self._get('/static/missing.css')
+        self.assertEqual(response['body'], b'django')
+
+
+class MediaServeTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        os.makedirs(os.path.join(self.media_root.name, 'posts'))
+        self.content = bytes(range(256)) * 4
+        self.path = os.path.join(self.media_root.name, 'posts', 'file.bin')
+        with open(self.path, 'wb') as media_file:
+            media_file.write(self.content)
+        self.url = '/media/posts/file.bin'
+
+    def _body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self._body(response), self.content)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(self._body(response), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(self._body(response), self.content[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_not_modified(self):
+        response = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=http_date(os.path.getmtime(self.path))
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_path_outside_media_root(self):
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE_MODE='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/file.bin')
+        self.assertEqual(response.content, b'')
+
+    def test_sendfile_non_ascii_name(self):
+        name = 'фото_1.jpg'
+        path = os.path.join(self.media_root.name, 'posts', name)
+        with open(path, 'wb') as media_file:
+            media_file.write(self.content)
+        url = '/media/posts/' + quote(name)
+
+        with self.settings(MEDIA_SENDFILE_MODE='x-accel-redirect'):
+            response = self.client.get(url)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/posts/%D1%84%D0%BE%D1%82%D0%BE_1.jpg')
+
+        with self.settings(MEDIA_SENDFILE_MODE='x-sendfile'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Sendfile'], quote(path))
+        self.assertEqual(unquote(response['X-Sendfile']), path)
+
+
+class FeedPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = _create_user()
+        Post.objects.bulk_create(
+            Post(text=f'пост {i}', author=cls.user) for i in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _window(self, number, num_pages, window=2):
+        paginator = make_paginator(range(num_pages), 1)
+        return page_window(paginator.page(number), window)
+
+    def test_page_window(self):
+        self.assertEqual(self._window(1, 3), [1, 2, 3])
+        self.assertEqual(self._window(1, 100), [1, 2, 3, None, 100])
+        self.assertEqual(
+            self._window(50, 100), [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(self._window(4, 100), [1, 2, 3, 4, 5, 6, None, 100])
+
+    def test_count_is_cached_until_post_written(self):
+        self.assertEqual(feed_count(Post.objects.all(), FEED_INDEX), 25)
+        with self.assertNumQueries(0):
+            self.assertEqual(feed_count(Post.objects.all(), FEED_INDEX), 25)
+
+        Post.objects.create(text='ещё пост', author=self.user)
+        self.assertEqual(feed_count(Post.objects.all(), FEED_INDEX), 26)
+
+    @override_settings(PAGINATOR_ESTIMATE_THRESHOLD=10)
+    def test_large_feed_is_estimated(self):
+        Post.objects.filter(pk__lte=Post.objects.order_by('pk')[0].pk).delete()
+        # оценка по максимальному ключу не видит удалённую запись
+        self.assertEqual(
+            feed_count(Post.objects.all(), estimate=True),
+            Post.objects.order_by('-pk')[0].pk
+        )
+
+    def test_paginator_renders_window(self):
+        Post.objects.bulk_create(
+            Post(text=f'пост {i}', author=self.user) for i in range(100)
+        )
+        response = self.client.get(reverse('index'), {'page': 6})
+        self.assertEqual(response.context['paginator'].num_pages, 13)
+        self.assertContains(response, '?page=13')
+        self.assertContains(response, '?page=8')
+        self.assertNotContains(response, '?page=9"')
+
+
+class SessionModeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = _create_user()
+
+    def _session_queries(self):
+        client = Client()
+        client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse('follow_index'))
+        self.assertEqual(response.status_code, 200)
+        return [
+            query for query in context.captured_queries
+            if 'django_session' in query['sql']
+        ]
+
+    def test_db_sessions_query_database(self):
+        with override_settings(
+                SESSION_ENGINE=settings.SESSION_ENGINES['db']):
+            self.assertTrue(self._session_queries())
+
+    def test_session_modes_skip_database(self):
+        for mode in ('cached_db', 'signed_cookies'):
+            with self.subTest(mode=mode), override_settings(
+                    SESSION_ENGINE=settings.SESSION_ENGINES[mode]):
+                self.assertEqual(self._session_queries(), [])
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE_TIMEOUT=60)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = _create_user()
+        cls.post = Post.objects.create(
+            text=DEFAULT_POST_TEXT, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.profile_url = reverse('profile', args=(DEFAULT_USERNAME,))
+
+    def test_hit_skips_database(self):
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertIn('Cookie', response['Vary'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, DEFAULT_POST_TEXT)
+
+    @override_settings(PAGE_CACHE_GENERATION_TIMEOUT=3600)
+    def test_generation_keys_expire(self):
+        add = mock.patch.object(cache, 'add', wraps=cache.add)
+        set_many = mock.patch.object(cache, 'set_many', wraps=cache.set_many)
+        with add as add, set_many as set_many:
+            # адрес несуществующего автора тоже создаёт поколение
+            self.client.get(reverse('profile', args=('nobody',)))
+            pagecache.purge(pagecache.author_scope('nobody'))
+        self.assertEqual(add.call_args[0][2], 3600)
+        self.assertEqual(set_many.call_args[0][1], 3600)
+
+    def test_hit_keeps_response_headers(self):
+        miss = self.client.get(self.profile_url)
+        hit = self.client.get(self.profile_url)
+        self.assertEqual(hit['X-Page-Cache'], 'hit')
+        for header in ('X-Frame-Options', 'Content-Type', 'Vary'):
+            self.assertEqual(hit[header], miss[header])
+
+    def test_query_string_is_part_of_key(self):
+        self.client.get(self.profile_url)
+        response = self.client.get(self.profile_url, {'page': 2})
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_authorized_user_bypasses_cache(self):
+        self.client.get(self.profile_url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.profile_url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_new_post_purges_author_pages(self):
+        post_url = reverse('post', args=(DEFAULT_USERNAME, self.post.id))
+        self.client.get(self.profile_url)
+        self.client.get(post_url)
+
+        Post.objects.create(text='новый пост', author=self.user)
+
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'новый пост')
+        response = self.client.get(post_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_follow_purges_profile(self):
+        self.client.get(self.profile_url)
+        Follow.objects.create(user=_create_user('reader'), author=self.user)
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response.context['following_count'], 1)
+
+    def test_group_rename_purges_author_and_old_group_pages(self):
+        group = Group.objects.create(
+            title='Старое название', slug='old-slug', description='-')
+        self.post.group = group
+        self.post.save()
+        old_group_url = reverse('group', args=('old-slug',))
+        self.client.get(self.profile_url)
+        self.client.get(old_group_url)
+
+        group.title = 'Новое название'
+        group.slug = 'new-slug'
+        group.save()
+
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Новое название')
+        response = self.client.get(old_group_url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_found_is_not_cached(self):
+        url = reverse('profile', args=('nobody',))
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+
+class FeedCacheTest(TestCase):
+    key = 'test_feed'
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def _build(self):
+        self.builds += 1
+        return f'значение {self.builds}'
+
+    def _expire(self):
+        entry = cache.get(self.key)
+        entry['expires'] = 0
+        cache.set(self.key, entry)
+
+    def test_fresh_value_is_reused(self):
+        self.assertEqual(
+            feedcache.get_or_build(self.key, self._build, 60), 'значение 1')
+        self.assertEqual(
+            feedcache.get_or_build(self.key, self._build, 60), 'значение 1')
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(feedcache.metrics()['hits'], 1)
+        self.assertEqual(feedcache.metrics()['misses'], 1)
+
+    def test_stale_value_served_while_other_worker_rebuilds(self):
+        feedcache.get_or_build(self.key, self._build, 60)
+        self._expire()
+        cache.add(f'{self.key}:lock', 1)
+
+        self.assertEqual(
+            feedcache.get_or_build(self.key, self._build, 60), 'значение 1')
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(feedcache.metrics()['stale'], 1)
+
+    def test_expired_value_rebuilt_by_lock_owner(self):
+        feedcache.get_or_build(self.key, self._build, 60)
+        self._expire()
+
+        self.assertEqual(
+            feedcache.get_or_build(self.key, self._build, 60), 'значение 2')
+        self.assertEqual(feedcache.metrics()['rebuilds'], 2)
+        self.assertIsNone(cache.get(f'{self.key}:lock'))
+
+    @override_settings(FEED_CACHE_BETA=10 ** 9)
+    def test_early_expiration(self):
+        feedcache.get_or_build(
+            self.key, lambda: time.sleep(0.01) or self._build(), 60)
+        feedcache.get_or_build(self.key, self._build, 60)
+        self.assertEqual(self.builds, 2)
+        self.assertEqual(feedcache.metrics()['early'], 1)
+
+    def test_index_fragment_uses_template_fragment_key(self):
+        client = Client()
+        client.get(reverse('index'))
+        entry = cache.get(make_template_fragment_key('index_page', [1]))
+        self.assertIn('expires', entry)
+
+    def test_index_fragment_varies_on_page(self):
+        author = _create_user()
+        Post.objects.bulk_create(
+            Post(text=f'пост {i}', author=author) for i in range(15))
+        client = Client()
+        first = client.get(reverse('index'))
+        second = client.get(reverse('index'), {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+        for post in second.context['page']:
+            self.assertContains(second, post.text)
+
+
+class ProfileSnapshotTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = _create_user('author')
+        for i in range(15):
+            Post.objects.create(text=f'пост {i}', author=cls.author)
+        cls.reader = _create_user()
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.url = reverse('profile', args=('author',))
+
+    def _profile_queries(self, client, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context]
+
+    def test_first_page_served_from_snapshot(self):
+        self.client.get(self.url)
+        response, queries = self._profile_queries(self.client)
+        self.assertEqual(len(response.context['page']), 10)
+        self.assertEqual(response.context['post_count'], 15)
+        for sql in queries:
+            self.assertNotIn('COUNT', sql)
+            self.assertNotIn('FROM "auth_user"', sql)
+            self.assertNotIn('posts_comment', sql)
+
+    def test_comment_count_from_snapshot(self):
+        post = Post.objects.get(text='пост 14')
+        Comment.objects.create(text='первый', author=self.reader, post=post)
+        self.client.get(self.url)
+        response, queries = self._profile_queries(self.client)
+        self.assertContains(response, '1 комментариев')
+        self.assertFalse([sql for sql in queries if 'posts_comment' in sql])
+
+        Comment.objects.create(text='второй', author=self.reader, post=post)
+        self.assertContains(self.client.get(self.url), '2 комментариев')
+
+    def test_second_page(self):
+        response, _ = self._profile_queries(self.client, page=2)
+        self.assertEqual(len(response.context['page']), 5)
+
+    def test_snapshot_rebuilt_on_new_post(self):
+        self.client.get(self.url)
+        Post.objects.create(text='свежий пост', author=self.author)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['post_count'], 16)
+        self.assertEqual(response.context['page'][0].text, 'свежий пост')
+
+    def test_follow_button_is_per_viewer(self):
+        response = self.reader_client.get(self.url)
+        self.assertFalse(response.context['following'])
+
+        self.reader_client.get(reverse('profile_follow', args=('author',)))
+        response = self.reader_client.get(self.url)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['following_count'], 1)
+        self.assertFalse(self.client.get(self.url).context['following'])
+
+        self.reader_client.get(reverse('profile_unfollow', args=('author',)))
+        response = self.reader_client.get(self.url)
+        self.assertFalse(response.context['following'])
+
+
+class FollowSetTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = _create_user()
+        cls.authors = [_create_user(f'author{i}') for i in range(3)]
+        for author in cls.authors:
+            Post.objects.create(text=f'пост {author.username}', author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_set_follows_subscriptions(self):
+        first, second, _ = self.authors
+        self.assertEqual(list(follows.followed_author_ids(self.reader.pk)), [])
+        Follow.objects.create(user=self.reader, author=second)
+        Follow.objects.create(user=self.reader, author=first)
+        self.assertEqual(
+            list(follows.followed_author_ids(self.reader.pk)),
+            sorted([first.pk, second.pk])
+        )
+        Follow.objects.filter(user=self.reader, author=first).delete()
+        self.assertEqual(
+            list(follows.followed_author_ids(self.reader.pk)), [second.pk])
+
+    def test_warm_check_skips_database(self):
+        author = self.authors[0]
+        Follow.objects.create(user=self.reader, author=author)
+        follows.followed_author_ids(self.reader.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(follows.is_following(self.reader, author.pk))
+            self.assertFalse(
+                follows.is_following(self.reader, self.authors[1].pk))
+
+    def test_feed_filters_by_author_ids(self):
+        for author in self.authors[:2]:
+            self.client.get(reverse('profile_follow', args=(author.username,)))
+        self.client.get(reverse('follow_index'))
+        # подписка сбрасывает набор, он читается заново один раз
+        self.client.get(
+            reverse('profile_follow', args=(self.authors[2].username,)))
+        self.client.get(reverse('follow_index'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('follow_index'))
+        texts = {post.text for post in response.context['page']}
+        self.assertEqual(
+            texts, {'пост author0', 'пост author1', 'пост author2'})
+        for query in context:
+            self.assertNotIn('"posts_follow"', query['sql'])
+
+    @override_settings(FOLLOW_SET_IN_LIMIT=1)
+    def test_feed_falls_back_to_subquery(self):
+        for author in self.authors[:2]:
+            self.client.get(reverse('profile_follow', args=(author.username,)))
+        response = self.client.get(reverse('follow_index'))
+        texts = {post.text for post in response.context['page']}
+        self.assertEqual(texts, {'пост author0', 'пост author1'})
+
+
+class UsernameCacheTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = _create_user('author')
+        cls.other = _create_user('other')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def _post_url(self, username='author'):
+        return reverse('post', args=(username, self.post.pk))
+
+    def test_post_page_does_not_join_users(self):
+        self.client.get(self._post_url())
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self._post_url())
+        self.assertEqual(response.context['post'].author, self.author)
+        for query in context:
+            self.assertNotIn('"auth_user"', query['sql'])
+
+    def test_post_of_other_author_is_not_found(self):
+        response = self.client.get(self._post_url('other'))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(self._post_url('nobody'))
+        self.assertEqual(response.status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertIsNone(usernames.user_id('nobody'))
+
+    def test_new_user_replaces_cached_miss(self):
+        self.assertIsNone(usernames.user_id('newcomer'))
+        newcomer = _create_user('newcomer')
+        self.assertEqual(usernames.user_id('newcomer'), newcomer.pk)
+
+    def test_sign_up_after_not_found(self):
+        profile_url = reverse('profile', args=('newcomer',))
+        self.assertEqual(self.client.get(profile_url).status_code, 404)
+        self.client.post(reverse('signup'), {
+            'username': 'newcomer',
+            'password1': 'Zx9!newcomer-pass',
+            'password2': 'Zx9!newcomer-pass',
+        })
+        self.assertTrue(User.objects.filter(username='newcomer').exists())
+        self.assertEqual(self.client.get(profile_url).status_code, 200)
+
+    def test_missing_name_is_cached_briefly(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            usernames.user_id('nobody')
+            usernames.user_id('author')
+        self.assertEqual(
+            [call[0][2] for call in cache_set.call_args_list],
+            [settings.USERNAME_MISSING_TIMEOUT,
+             settings.USERNAME_CACHE_TIMEOUT])
+
+    def test_rename_and_delete(self):
+        self.assertEqual(usernames.user_id('author'), self.author.pk)
+        # общий для тестов объект не меняем
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed'
+        author.save()
+        self.assertIsNone(usernames.user_id('author'))
+        self.assertEqual(self.client.get(self._post_url()).status_code, 404)
+        response = self.client.get(self._post_url('renamed'))
+        self.assertEqual(response.status_code, 200)
+
+        author.delete()
+        self.assertIsNone(usernames.user_id('renamed'))
+
+    def test_login_keeps_caches(self):
+        self.assertEqual(usernames.user_id('author'), self.author.pk)
+        self.assertTrue(
+            self.client.login(username='author', password='author'))
+        with self.assertNumQueries(0):
+            self.assertEqual(usernames.user_id('author'), self.author.pk)
+
+    def test_follow_by_cached_id(self):
+        self.client.force_login(self.other)
+        self.client.get(reverse('profile_follow', args=('author',)))
+        self.assertTrue(Follow.objects.filter(
+            user=self.other, author=self.author).exists())
+        self.client.get(reverse('profile_unfollow', args=('author',)))
+        self.assertFalse(Follow.objects.filter(user=self.other).exists())
+        response = self.client.get(
+            reverse('profile_follow', args=('nobody',)))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(FOLLOW_FEED_ENGINE='merge', FOLLOW_FEED_AUTHOR_POSTS=5,
+                   FOLLOW_FEED_MERGE_DEPTH=20)
+class MergedFeedTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = _create_user()
+        cls.authors = [_create_user(f'author{i}') for i in range(3)]
+        for i in range(12):
+            Post.objects.create(
+                text=f'пост {i}', author=cls.authors[i % 3])
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def _feed(self, page=1):
+        response = self.client.get(reverse('follow_index'), {'page': page})
+        return [post.text for post in response.context['page']]
+
+    def _expected(self, page=1):
+        posts = Post.objects.filter(
+            author__in=self.authors).order_by('-pub_date', '-id')
+        return [post.text for post in posts[(page - 1) * 10:page * 10]]
+
+    def test_feed_matches_sql_order(self):
+        self.assertEqual(self._feed(), self._expected())
+        self.assertEqual(self._feed(2), self._expected(2))
+
+    def test_warm_first_page_uses_in_bulk(self):
+        self._feed()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('follow_index'))
+        self.assertEqual(response.context['paginator'].count, 12)
+        # счёт новых постов с прошлого визита не в счёт
+        post_queries = [
+            query['sql'] for query in context
+            if 'FROM "posts_post"' in query['sql']
+            and '"pub_date" >' not in query['sql']
+        ]
+        self.assertEqual(len(post_queries), 1)
+        self.assertNotIn('ORDER BY', post_queries[0])
+        self.assertNotIn('COUNT', post_queries[0])
+
+    def test_new_post_appears_first(self):
+        self._feed()
+        Post.objects.create(text='свежий пост', author=self.authors[1])
+        self.assertEqual(self._feed()[0], 'свежий пост')
+        self.assertEqual(self._feed(), self._expected())
+
+    @override_settings(FOLLOW_FEED_AUTHOR_POSTS=2)
+    def test_load_reads_only_kept_posts(self):
+        author_ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(2):
+            lists = timeline.author_lists(author_ids)
+        for author in self.authors:
+            posts = Post.objects.filter(
+                author=author).order_by('-pub_date', '-id')
+            self.assertEqual(lists[author.pk]['count'], 4)
+            self.assertEqual(
+                lists[author.pk]['posts'],
+                [(post.pub_date.timestamp(), post.pk) for post in posts[:2]])
+
+    def test_truncated_lists_fall_back_to_sql(self):
+        lists = timeline.author_lists([author.pk for author in self.authors])
+        merged, horizon = timeline.merge(list(lists.values()))
+        self.assertIsNone(horizon)
+
+        for i in range(6):
+            Post.objects.create(text=f'ещё {i}', author=self.authors[0])
+        self.assertEqual(self._feed(), self._expected())
+        self.assertEqual(self._feed(2), self._expected(2))
+
+
+@override_settings(FOLLOW_FEED_ENGINE='hybrid', FOLLOW_FANOUT_THRESHOLD=2)
+class HybridFeedTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = _create_user()
+        cls.other_reader = _create_user('other_reader')
+        cls.author = _create_user('author')
+        cls.celebrity = _create_user('celebrity')
+        for i in range(6):
+            Post.objects.create(text=f'пост {i}', author=cls.author)
+            Post.objects.create(text=f'звезда {i}', author=cls.celebrity)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+        Follow.objects.create(user=cls.other_reader, author=cls.celebrity)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def _feed(self):
+        response = self.client.get(reverse('follow_index'))
+        return [post.text for post in response.context['page']]
+
+    def _expected(self):
+        posts = Post.objects.filter(
+            author__in=(self.author, self.celebrity)
+        ).order_by('-pub_date', '-id')
+        return [post.text for post in posts[:10]]
+
+    def test_celebrity_is_merged_on_read(self):
+        self.assertEqual(self._feed(), self._expected())
+        user_timeline = cache.get(f'timeline:{self.reader.pk}')
+        self.assertEqual(user_timeline['authors'], {self.author.pk})
+        self.assertEqual(user_timeline['count'], 6)
+
+    def test_new_posts_pushed_only_below_threshold(self):
+        self._feed()
+        key = f'timeline:{self.reader.pk}'
+        Post.objects.create(text='звезда новая', author=self.celebrity)
+        self.assertEqual(cache.get(key)['count'], 6)
+        post = Post.objects.create(text='пост новый', author=self.author)
+        user_timeline = cache.get(key)
+        self.assertEqual(user_timeline['count'], 7)
+        self.assertEqual(
+            user_timeline['posts'][0], (post.pub_date.timestamp(), post.pk))
+        self.assertEqual(
+            self._feed()[:2], ['пост новый', 'звезда новая'])
+        self.assertEqual(self._feed(), self._expected())
+
+    def test_locked_timeline_is_rebuilt_on_read(self):
+        self._feed()
+        # ленту в это время пишет другой процесс
+        cache.add(f'timeline_lock:{self.reader.pk}', True)
+        Post.objects.create(text='пост новый', author=self.author)
+        self.assertEqual(cache.get(f'timeline:{self.reader.pk}')['count'], 6)
+        cache.delete(f'timeline_lock:{self.reader.pk}')
+        self.assertEqual(self._feed()[0], 'пост новый')
+        self.assertEqual(self._feed(), self._expected())
+
+    def test_unfollow_rebuilds_timeline(self):
+        self._feed()
+        self.client.get(reverse('profile_unfollow', args=('author',)))
+        self.assertEqual(
+            self._feed(), [f'звезда {i}' for i in reversed(range(6))])
+
+
+class NotificationTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = _create_user()
+        cls.author = _create_user('author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_unread_badge(self):
+        Post.objects.create(text='новый пост', author=self.author)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['unread_posts'], 1)
+        self.assertContains(response, 'badge-danger')
+        # публикация ничего не пишет подписчикам
+        self.assertFalse(NotificationState.objects.exists())
+
+    def test_follow_page_marks_posts_seen(self):
+        Post.objects.create(text='новый пост', author=self.author)
+        self.client.get(reverse('index'))
+        self.client.get(reverse('follow_index'))
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['unread_posts'], 0)
+        self.assertNotContains(response, 'badge-danger')
+
+    def test_digest_is_sent_once(self):
+        other_author = _create_user('other_author')
+        Follow.objects.create(user=self.reader, author=other_author)
+        for _ in range(2):
+            Post.objects.create(text='пост', author=self.author)
+        Post.objects.create(text='пост', author=other_author)
+        _create_user('no_follows')
+
+        call_command('send_digests', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.reader.email])
+        self.assertIn('@author: 2', mail.outbox[0].body)
+        self.assertIn('@other_author: 1', mail.outbox[0].body)
+
+        call_command('send_digests', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_digest_skips_drafts_and_deleted_posts(self):
+        Post.objects.create(text='черновик', author=self.author,
+                            published=False)
+        deletion.soft_delete(
+            Post.objects.create(text='удалённый', author=self.author))
+        call_command('send_digests', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_digests_are_batched(self):
+        Post.objects.create(text='пост', author=self.author)
+        for i in range(4):
+            Follow.objects.create(
+                user=_create_user(f'reader{i}'), author=self.author)
+        call_command(
+            'send_digests', batch_size=2, stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(
+            NotificationState.objects.filter(
+                digest_sent_at__isnull=False).count(),
+            5
+        )
+
+
+class FollowUnreadMarkerTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = _create_user()
+        cls.author = _create_user('author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(3):
+            Post.objects.create(text=f'старый {i}', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+        self.url = reverse('follow_index')
+
+    def test_new_posts_are_marked_once(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['new_count'], 3)
+        self.assertNotContains(response, 'Прочитанное ранее')
+
+        for i in range(2):
+            Post.objects.create(text=f'новый {i}', author=self.author)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['new_count'], 2)
+        self.assertEqual(
+            [post.is_new for post in response.context['page']],
+            [True, True, False, False, False]
+        )
+        self.assertContains(response, 'Новых постов с прошлого визита: 2')
+        self.assertContains(response, 'Прочитанное ранее', count=1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['new_count'], 0)
+        self.assertNotContains(response, 'Прочитанное ранее')
+
+    def test_new_posts_counted_with_one_query(self):
+        self.client.get(self.url)
+        Post.objects.create(text='новый', author=self.author)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        counts = [
+            query['sql'] for query in context
+            if 'COUNT' in query['sql'] and '"pub_date" >' in query['sql']
+        ]
+        self.assertEqual(len(counts), 1)
+
+    def test_deep_page_keeps_watermark(self):
+        for i in range(10):
+            Post.objects.create(text=f'ещё {i}', author=self.author)
+        self.client.get(self.url)
+        seen_at = NotificationState.objects.get(user=self.reader).seen_at
+        Post.objects.create(text='новый', author=self.author)
+        self.client.get(self.url, {'page': 2})
+        self.assertEqual(
+            NotificationState.objects.get(user=self.reader).seen_at, seen_at)
+
+
+class AdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', '', 'admin')
+        cls.authors = [_create_user(f'author{i}') for i in range(3)]
+        for author in cls.authors:
+            post = Post.objects.create(text=f'пост {author}', author=author)
+            Comment.objects.create(
+                text='комментарий', author=author, post=post)
+            Follow.objects.create(user=cls.admin, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def _get(self, name, *args, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse(f'admin:posts_{name}', args=args), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context]
+
+    def test_changelists_do_not_scan_tables(self):
+        for name in ('post', 'comment', 'follow'):
+            response, queries = self._get(f'{name}_changelist')
+            for sql in queries:
+                self.assertNotIn('DISTINCT', sql)
+                self.assertNotIn('MIN(', sql)
+
+    def test_list_filters_do_not_enumerate_users(self):
+        response, _ = self._get('follow_changelist')
+        self.assertNotContains(response, 'author__id__exact')
+        self.assertNotContains(response, 'user__id__exact')
+
+    def test_author_filter(self):
+        response, _ = self._get(
+            'post_changelist', author_username='author1')
+        self.assertEqual(
+            [post.author for post in response.context['cl'].result_list],
+            [self.authors[1]]
+        )
+
+    def test_date_hierarchy(self):
+        today = timezone.localdate()
+        response, _ = self._get('post_changelist')
+        self.assertContains(response, f'pub_date__day={today.day}')
+        response, _ = self._get(
+            'post_changelist',
+            pub_date__year=today.year, pub_date__month=today.month,
+            pub_date__day=today.day,
+        )
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_delete_confirmation_loads_authors_at_once(self):
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        model_admin = PostAdmin(Post, admin.site)
+        with self.assertNumQueries(1):
+            deleted, *_ = model_admin.get_deleted_objects(
+                Post.all_objects.all(), request)
+        self.assertIn('@author2: пост author2', deleted)
+
+    def test_change_form_does_not_list_users(self):
+        post = Post.objects.first()
+        response, _ = self._get('post_change', post.pk)
+        self.assertNotContains(response, f'<option value="{self.admin.pk}"')
+        self.assertContains(response, 'admin-autocomplete')
+
+
+class PostDeletionTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = _create_user('author')
+        cls.reader = _create_user()
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='удаляемый пост', author=self.author, group=self.group,
+            image=SimpleUploadedFile('deleted.gif', SMALL_GIF, 'image/gif'))
+        Post.objects.create(text='другой пост', author=self.author)
+        Comment.objects.bulk_create(
+            Comment(text=f'комментарий {i}', author=self.reader,
+                    post=self.post)
+            for i in range(5)
+        )
+        self.client.force_login(self.author)
+        self.delete_url = reverse(
+            'post_delete', args=('author', self.post.pk))
+
+    def _pages(self):
+        return (
+            reverse('index'),
+            reverse('group', args=('group',)),
+            reverse('profile', args=('author',)),
+        )
+
+    def test_deleted_post_is_hidden_at_once(self):
+        reader = Client()
+        reader.force_login(self.reader)
+        for url in self._pages():
+            self.assertContains(self.client.get(url), 'удаляемый пост')
+        self.assertContains(
+            reader.get(reverse('follow_index')), 'удаляемый пост')
+
+        response = self.client.post(self.delete_url)
+        self.assertRedirects(response, reverse('profile', args=('author',)))
+        for url in self._pages():
+            self.assertNotContains(self.client.get(url), 'удаляемый пост')
+        response = reader.get(reverse('follow_index'))
+        self.assertNotContains(response, 'удаляемый пост')
+        self.assertEqual(response.context['paginator'].count, 1)
+        response = self.client.get(
+            reverse('post', args=('author', self.post.pk)))
+        self.assertEqual(response.status_code, 404)
+        # тяжёлая часть остаётся фоновой задаче
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 5)
+
+    def test_only_author_can_delete(self):
+        reader = Client()
+        reader.force_login(self.reader)
+        reader.post(self.delete_url)
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+        response = self.client.get(self.delete_url)
+        self.assertContains(response, 'удаляемый пост')
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_purge_removes_comments_and_files(self):
+        image_name = self.post.image.name
+        self.assertTrue(default_storage.exists(image_name))
+        self.client.post(self.delete_url)
+        call_command(
+            'purge_deleted_posts', batch_size=2,
+            stdout=open(os.devnull, 'w'))
+        self.assertFalse(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(default_storage.exists(image_name))
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_shared_image_is_kept(self):
+        other = Post.objects.create(
+            text='та же картинка', author=self.author,
+            image=self.post.image.name)
+        self.client.post(self.delete_url)
+        call_command('purge_deleted_posts', stdout=open(os.devnull, 'w'))
+        self.assertTrue(default_storage.exists(other.image.name))
+
+    def test_admin_delete_is_soft(self):
+        admin_user = User.objects.create_superuser('admin', '', 'admin')
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse('admin:posts_post_delete', args=(self.post.pk,)),
+            {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNotNone(
+            Post.all_objects.get(pk=self.post.pk).deleted_at)
+        self.assertEqual(Comment.objects.count(), 5)
+
+
+class PostSchedulingTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = _create_user('author')
+        cls.reader = _create_user()
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def _pages(self):
+        return (
+            reverse('index'),
+            reverse('group', args=('group',)),
+            reverse('profile', args=('author',)),
+        )
+
+    def _schedule(self, text, delay=timedelta(hours=1)):
+        return Post.objects.create(
+            text=text, author=self.author, group=self.group,
+            published=False, scheduled_at=timezone.now() + delay)
+
+    def test_new_post_form_keeps_three_fields(self):
+        response = self.client.get(reverse('new_post'))
+        self.assertEqual(len(response.context['form'].fields), 3)
+        self.assertIn('publish_at', response.context['publish_form'].fields)
+
+    def test_draft_is_visible_only_to_author(self):
+        response = self.client.post(
+            reverse('new_post'),
+            {'text': 'черновик поста', 'group': self.group.pk,
+             'draft': 'on'})
+        self.assertRedirects(response, reverse('drafts'))
+        post = Post.all_objects.get(text='черновик поста')
+        self.assertFalse(post.published)
+        for url in self._pages():
+            self.assertNotContains(
+                self.reader_client.get(url), 'черновик поста')
+        self.assertNotContains(
+            self.reader_client.get(reverse('follow_index')),
+            'черновик поста')
+        post_url = reverse('post', args=('author', post.pk))
+        self.assertEqual(self.reader_client.get(post_url).status_code, 404)
+        self.assertContains(self.client.get(post_url), 'черновик поста')
+        self.assertContains(
+            self.client.get(reverse('drafts')), 'черновик поста')
+
+    def test_past_publish_time_is_rejected(self):
+        response = self.client.post(
+            reverse('new_post'),
+            {'text': 'опоздавший пост',
+             'publish_at': '2000-01-01 09:00'})
+        self.assertFormError(
+            response, 'publish_form', 'publish_at', 'Это время уже прошло.')
+        self.assertFalse(Post.all_objects.exists())
+
+    def test_edited_draft_is_published(self):
+        # подписчик уже загрузил ленту до публикации
+        self.reader_client.get(reverse('follow_index'))
+        post = self._schedule('отложенный пост')
+        self.client.post(
+            reverse('post_edit', args=('author', post.pk)),
+            {'text': 'отложенный пост', 'group': self.group.pk})
+        post.refresh_from_db()
+        self.assertTrue(post.published)
+        self.assertIsNone(post.scheduled_at)
+        for url in self._pages():
+            self.assertContains(self.client.get(url), 'отложенный пост')
+        self.assertContains(
+            self.reader_client.get(reverse('follow_index')),
+            'отложенный пост')
+
+    def test_due_posts_are_published_in_batches(self):
+        # главная кэшируется фрагментом на 20 секунд, как и для новых постов
+        for url in self._pages()[1:]:
+            self.reader_client.get(url)
+        self.reader_client.get(reverse('follow_index'))
+        for i in range(5):
+            self._schedule(f'пост по расписанию {i}', -timedelta(minutes=i))
+        self._schedule('пост на завтра', timedelta(days=1))
+
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(
+                publishing.publish_due(batch_size=5), 5)
+        self.assertEqual(Post.objects.count(), 5)
+        for url in self._pages():
+            response = self.reader_client.get(url)
+            self.assertContains(response, 'пост по расписанию 4')
+            self.assertNotContains(response, 'пост на завтра')
+        self.assertContains(
+            self.reader_client.get(reverse('follow_index')),
+            'пост по расписанию 0')
+
+        for i in range(20):
+            self._schedule(f'ещё пост {i}', -timedelta(minutes=i))
+        with CaptureQueriesContext(connection) as large:
+            publishing.publish_due(batch_size=20)
+        # запросы на пачку не зависят от числа постов в ней
+        self.assertEqual(len(large), len(small))
+
+    def test_command_publishes_due_posts(self):
+        self._schedule('пост по расписанию', -timedelta(minutes=1))
+        call_command(
+            'publish_scheduled', batch_size=1, stdout=open(os.devnull, 'w'))
+        self.assertTrue(Post.objects.filter(text='пост по расписанию'))
+
+
+class LikeTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = _create_user('author')
+        cls.readers = [_create_user(f'reader{i}') for i in range(3)]
+        cls.post = Post.objects.create(
+            text='пост с лайками', author=cls.author)
+        cls.other = Post.objects.create(text='другой пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.readers[0])
+        self.like_url = reverse('post_like', args=('author', self.post.pk))
+        self.unlike_url = reverse(
+            'post_unlike', args=('author', self.post.pk))
+
+    def _likes_count(self, post):
+        return Post.objects.get(pk=post.pk).likes_count
+
+    def test_like_is_unique_and_counted_on_flush(self):
+        self.client.post(self.like_url)
+        self.client.post(self.like_url)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+        # строка поста не обновляется до flush_likes
+        self.assertEqual(self._likes_count(self.post), 0)
+        call_command('flush_likes', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self._likes_count(self.post), 1)
+        self.assertFalse(LikeDelta.objects.exists())
+
+        response = self.client.get(
+            reverse('post', args=('author', self.post.pk)))
+        self.assertTrue(response.context['liked'])
+        self.assertContains(response, self.unlike_url)
+
+        self.client.post(self.unlike_url)
+        self.client.post(self.unlike_url)
+        likes.flush()
+        self.assertEqual(self._likes_count(self.post), 0)
+
+    def test_like_requires_post_method(self):
+        self.client.get(self.like_url)
+        self.assertFalse(Like.objects.exists())
+
+    def test_flush_updates_each_total_once(self):
+        for reader in self.readers:
+            likes.like(reader, self.post)
+            likes.like(reader, self.other)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(likes.flush(batch_size=2), 2)
+        updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        # у обоих постов сумма 3 в итоге, но пачек по 2 изменения три
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(self._likes_count(self.post), 3)
+        self.assertEqual(self._likes_count(self.other), 3)
+
+    def test_feed_shows_count_without_like_queries(self):
+        likes.like(self.readers[1], self.post)
+        likes.flush()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('profile', args=('author',)))
+        self.assertContains(response, '&#9829; 1')
+        self.assertFalse(
+            [query for query in queries if 'posts_like' in query['sql']])
+
+    def test_flush_keeps_deltas_it_did_not_read(self):
+        likes.like(self.readers[0], self.post)
+        likes.like(self.readers[1], self.post)
+        # лайк, записанный уже после чтения пачки
+        original = Post.all_objects.filter
+
+        def late_like(*args, **kwargs):
+            LikeDelta.objects.create(post=self.other, delta=1)
+            return original(*args, **kwargs)
+
+        with mock.patch.object(Post.all_objects, 'filter', late_like):
+            likes._flush_batch(10)
+        self.assertEqual(self._likes_count(self.post), 2)
+        self.assertEqual(LikeDelta.objects.count(), 1)
+        likes.flush()
+        self.assertEqual(self._likes_count(self.other), 1)
+
+    def test_purge_deletes_likes(self):
+        likes.like(self.readers[1], self.post)
+        deletion.soft_delete(self.post)
+        call_command('purge_deleted_posts', stdout=open(os.devnull, 'w'))
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(LikeDelta.objects.exists())
+
+
+@override_settings(ANONYMOUS_PAGE_CACHE_TIMEOUT=60)
+class SyndicationFeedTest(PostsTestWithHelpers):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = _create_user('author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание')
+        cls.post = Post.objects.create(
+            text='пост для ленты', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def _urls(self):
+        return (
+            reverse('index_feed', args=('rss',)),
+            reverse('group_feed', args=('group', 'atom')),
+            reverse('profile_feed', args=('author', 'rss')),
+        )
+
+    def test_feeds_list_posts(self):
+        for url in self._urls():
+            response = self.client.get(url)
+            self.assertContains(response, 'пост для ленты')
+            self.assertContains(
+                response, reverse('post', args=('author', self.post.pk)))
+        response = self.client.get(self._urls()[1])
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/atom+xml'))
+        response = self.client.get(
+            reverse('profile_feed', args=('nobody', 'rss')))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_and_cached_bytes(self):
+        for url in self._urls():
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertContains(response, 'пост для ленты')
+
+    def test_new_post_invalidates_feeds(self):
+        etags = [self.client.get(url)['ETag'] for url in self._urls()]
+        Post.objects.create(
+            text='свежий пост', author=self.author, group=self.group)
+        for url, etag in zip(self._urls(), etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'свежий пост')
+
+    @override_settings(ANONYMOUS_PAGE_CACHE_TIMEOUT=0)
+    def test_conditional_get_without_page_cache(self):
+        for url in self._urls():
+            response = self.client.get(url)
+            self.assertTrue(response.has_header('Last-Modified'))
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+        etag = self.client.get(self._urls()[0])['ETag']
+        Post.objects.create(text='свежий пост', author=self.author)
+        response = self.client.get(self._urls()[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'свежий пост')
+
+    def test_pages_link_to_feeds(self):
+        response = self.client.get(reverse('group', args=('group',)))
+        self.assertContains(response, self._urls()[1])
+
+
+class SeedCommandTest(TestCase):
+    def _seed(self, prefix, seed=1):
+        call_command(
+            'seed', users=60, groups=3, posts=300, comments=200,
+            follows_per_user=6, seed=seed, prefix=prefix,
+            stdout=open(os.devnull, 'w'),
+        )
+        users = User.objects.filter(username__startswith=f'{prefix}user')
+        index = {
+            pk: username[len(prefix):]
+            for pk, username in users.values_list('pk', 'username')
+        }
+        follows = sorted(
+            (index[user_id], index[author_id])
+            for user_id, author_id in Follow.objects.filter(
+                user__in=users).values_list('user_id', 'author_id')
+        )
+        posts = [
+            index[author_id] for author_id in Post.objects.filter(
+                author__in=users).order_by('pk').values_list(
+                'author_id', flat=True)
+        ]
+        return follows, posts
+
+    def test_same_seed_gives_same_graph(self):
+        first = self._seed('a_')
+        self.assertEqual(self._seed('b_'), first)
+        self.assertNotEqual(self._seed('c_', seed=2), first)
+
+    def test_graph_shape(self):
+        follows, posts = self._seed('a_')
+        self.assertEqual(len(posts), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertEqual(Group.objects.count(), 3)
+        followers = sorted(
+            Follow.objects.values('author').annotate(
+                followers=Count('id')).values_list('followers', flat=True),
+            reverse=True
+        )
+        # у самых популярных авторов подписчиков намного больше медианы
+        self.assertGreater(followers[0], 4 * followers[len(followers) // 2])
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(max(dates) - min(dates), timedelta(days=30))
+
+    def test_existing_prefix_is_rejected(self):
+        self._seed('a_')
+        with self.assertRaises(CommandError):
+            self._seed('a_')
+
+
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('admin', '', 'admin')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        overrides = override_settings(
+            PROFILING_ENABLED=True,
+            PROFILING_DIR=self.directory.name,
+            PROFILING_TOKEN='secret',
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _profiles(self):
+        return [
+            name for name in os.listdir(self.directory.name)
+            if name.endswith(profiling.PROFILE_SUFFIX)
+        ]
+
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('index'), HTTP_X_PROFILE='1')
+        self.assertEqual(self._profiles(), [response['X-Profile-File']])
+
+        response = self.client.get(reverse('profiling'))
+        self.assertContains(response, response.context['profiles'][0])
+        response = self.client.get(reverse(
+            'profiling_detail', args=(self._profiles()[0],)))
+        self.assertContains(response, 'function calls')
+
+    def test_header_is_ignored_for_other_users(self):
+        self.client.force_login(_create_user())
+        response = self.client.get(reverse('index'), HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-File', response)
+        self.assertEqual(self._profiles(), [])
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_token_enables_profiling(self):
+        self.client.get(reverse('index'), HTTP_X_PROFILE='wrong')
+        self.assertEqual(self._profiles(), [])
+        self.client.get(reverse('index'), HTTP_X_PROFILE='secret')
+        self.assertEqual(len(self._profiles()), 1)
+
+    def test_unknown_profile_is_not_found(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('profiling_detail', args=('settings.py',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_samples_are_collected(self):
+        sampler = profiling.Sampler()
+        sampler.track(threading.get_ident())
+        sampler.sample()
+        sampler.sample()
+        sampler.flush()
+        sampler.sample()
+        sampler.flush()
+        samples = profiling.collected_samples()
+        self.assertEqual(sum(samples.values()), 3)
+        stack = next(iter(samples))
+        self.assertTrue(stack.endswith(
+            'test_samples_are_collected;yatube.profiling.sample'))
+
+    def test_concurrent_flushes_keep_every_sample(self):
+        sampler = profiling.Sampler()
+        sampler.track(threading.get_ident())
+        errors = []
+
+        def sample_and_flush():
+            try:
+                for _ in range(50):
+                    sampler.sample()
+                    sampler.flush()
+            except Exception as error:
+                errors.append(error)
+
+        threads = [
+            threading.Thread(target=sample_and_flush) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(profiling.collected_samples().values()), 400)
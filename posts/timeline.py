@@ -0,0 +1,374 @@
+"""Лента подписок слиянием коротких списков постов каждого автора.
+
+Для автора в кэше хранится число его постов и до FOLLOW_FEED_AUTHOR_POSTS
+последних пар (время публикации, id). Страница ленты собирается
+k-путевым слиянием этих списков на куче, а сами посты читаются одним
+in_bulk. Страницы глубже коротких списков строятся обычным SQL-запросом.
+
+В режиме hybrid у каждого читателя есть своя готовая лента
+timeline:<user_id>, собранная из списков авторов. Новый пост дописывается
+в уже собранные ленты подписчиков автора. Ленту меняют только под
+блокировкой читателя (cache.add): если её держит другой процесс, лента
+помечается устаревшей и перестраивается при следующем чтении, так что
+одновременные записи не теряются. Авторы, у которых больше
+FOLLOW_FANOUT_THRESHOLD подписчиков, в ленты не пишут: их списки
+подмешиваются при чтении.
+"""
+import hashlib
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from . import feedcache
+from .models import Follow, Post
+
+ENGINE_SQL = 'sql'
+ENGINE_MERGE = 'merge'
+ENGINE_HYBRID = 'hybrid'
+
+CELEBRITIES_KEY = 'timeline:celebrities'
+
+# сколько авторов подставлять в один запрос при загрузке списков
+LOAD_CHUNK = 500
+# на сколько секунд блокируется лента читателя при записи
+TIMELINE_LOCK_TIMEOUT = 10
+
+
+def _key(author_id):
+    return f'author_posts:{author_id}'
+
+
+def _top_posts(author_ids, limit):
+    """Последние limit постов каждого автора, без чтения остальных."""
+    ranked = (
+        Post.objects
+        .filter(author_id__in=author_ids)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        ))
+        .values('id', 'author_id', 'pub_date', 'position')
+    )
+    sql, params = ranked.query.sql_with_params()
+    # фильтр по оконной функции ORM не строит, поэтому внешний запрос
+    # сырой; raw приводит pub_date к datetime как обычный запрос
+    return Post.objects.raw(
+        f'SELECT id, author_id, pub_date FROM ({sql}) '
+        f'WHERE position <= %s ORDER BY author_id, position',
+        (*params, limit)
+    )
+
+
+def _load(author_ids):
+    """Списки авторов, которых нет в кэше: число постов и последние."""
+    limit = settings.FOLLOW_FEED_AUTHOR_POSTS
+    author_ids = list(author_ids)
+    lists = {author_id: {'count': 0, 'posts': []} for author_id in author_ids}
+    for start in range(0, len(author_ids), LOAD_CHUNK):
+        chunk = author_ids[start:start + LOAD_CHUNK]
+        counts = (
+            Post.objects
+            .filter(author_id__in=chunk)
+            .order_by()
+            .values('author_id')
+            .annotate(count=Count('id'))
+            .values_list('author_id', 'count')
+        )
+        for author_id, count in counts:
+            lists[author_id]['count'] = count
+        for post in _top_posts(chunk, limit):
+            lists[post.author_id]['posts'].append(
+                (post.pub_date.timestamp(), post.id))
+    cache.set_many(
+        {_key(author_id): lists[author_id] for author_id in author_ids},
+        settings.FOLLOW_FEED_AUTHOR_TIMEOUT
+    )
+    return lists
+
+
+def author_lists(author_ids):
+    keys = {_key(author_id): author_id for author_id in author_ids}
+    lists = {
+        keys[key]: author_list
+        for key, author_list in cache.get_many(list(keys)).items()
+    }
+    missing = [author_id for author_id in author_ids if author_id not in lists]
+    if missing:
+        lists.update(_load(missing))
+    return lists
+
+
+def add_post(post):
+    add_posts([post])
+
+
+def add_posts(posts):
+    """Сбрасывает списки авторов новых постов; загрузятся уже с ними."""
+    invalidate(*{post.author_id for post in posts})
+
+
+def invalidate(*author_ids):
+    cache.delete_many([_key(author_id) for author_id in author_ids])
+
+
+def _timeline_key(user_id):
+    return f'timeline:{user_id}'
+
+
+def _stale_key(user_id):
+    return f'timeline_stale:{user_id}'
+
+
+def _lock_key(user_id):
+    return f'timeline_lock:{user_id}'
+
+
+def _lock(user_ids):
+    """Блокирует ленты читателей; возвращает тех, чьи ленты удалось."""
+    return [
+        user_id for user_id in user_ids
+        if cache.add(_lock_key(user_id), True, TIMELINE_LOCK_TIMEOUT)
+    ]
+
+
+def _unlock(user_ids):
+    cache.delete_many([_lock_key(user_id) for user_id in user_ids])
+
+
+def celebrities():
+    """Авторы с числом подписчиков от порога и версия этого набора.
+
+    Набор сбрасывается, когда автор пересекает порог, и на всякий случай
+    пересчитывается раз в FOLLOW_FANOUT_RECHECK секунд. Версия зависит
+    только от состава, поэтому ленты читателей перестраиваются лишь при
+    его изменении.
+    """
+    def build():
+        author_ids = sorted(
+            Follow.objects
+            .values('author_id')
+            .annotate(followers=Count('id'))
+            .filter(followers__gte=settings.FOLLOW_FANOUT_THRESHOLD)
+            .values_list('author_id', flat=True)
+        )
+        version = hashlib.md5(
+            ','.join(map(str, author_ids)).encode()).hexdigest()
+        return version, frozenset(author_ids)
+
+    return feedcache.get_or_build(
+        CELEBRITIES_KEY, build, settings.FOLLOW_FANOUT_RECHECK)
+
+
+def followers_changed(author_id):
+    """Сбрасывает набор авторов выше порога, если автор его пересёк."""
+    if settings.FOLLOW_FEED_ENGINE != ENGINE_HYBRID:
+        return
+    followers = Follow.objects.filter(author_id=author_id).count()
+    threshold = settings.FOLLOW_FANOUT_THRESHOLD
+    if followers in (threshold - 1, threshold):
+        cache.delete(CELEBRITIES_KEY)
+
+
+def _build_timeline(user_id, author_ids, version, skipped):
+    covered = [
+        author_id for author_id in author_ids if author_id not in skipped]
+    # пока ленту пишет другой процесс, собранная не сохраняется
+    locked = _lock([user_id])
+    try:
+        if locked:
+            # пост, дописанный во время сборки, снова пометит ленту
+            cache.delete(_stale_key(user_id))
+        lists = list(author_lists(covered).values())
+        merged, horizon = merge(lists)
+        entries = list(islice(merged, settings.FOLLOW_FEED_TIMELINE_POSTS))
+        if horizon is not None:
+            entries = [entry for entry in entries if entry >= horizon]
+        timeline = {
+            'version': version,
+            'authors': frozenset(covered),
+            'count': sum(author_list['count'] for author_list in lists),
+            'posts': entries,
+        }
+        if locked:
+            cache.set(
+                _timeline_key(user_id), timeline,
+                settings.FOLLOW_FEED_AUTHOR_TIMEOUT)
+    finally:
+        _unlock(locked)
+    return timeline
+
+
+def user_timeline(user_id, author_ids):
+    version, skipped = celebrities()
+    key = _timeline_key(user_id)
+    cached = cache.get_many([key, _stale_key(user_id)])
+    timeline = cached.get(key)
+    if (
+        timeline is None
+        or len(cached) > 1
+        or timeline['version'] != version
+        # отписка: посты автора из готовой ленты не вычесть
+        or not timeline['authors'] <= author_ids
+    ):
+        timeline = _build_timeline(user_id, author_ids, version, skipped)
+    return timeline
+
+
+def _push(timeline, entries):
+    timeline['count'] += len(entries)
+    timeline['posts'] = list(islice(
+        heapq.merge(entries, timeline['posts'], reverse=True),
+        settings.FOLLOW_FEED_TIMELINE_POSTS
+    ))
+
+
+def fan_out(*posts):
+    """Дописывает новые посты в собранные ленты подписчиков авторов."""
+    if settings.FOLLOW_FEED_ENGINE != ENGINE_HYBRID:
+        return
+    _, skipped = celebrities()
+    by_author = defaultdict(list)
+    for post in posts:
+        if post.author_id not in skipped:
+            by_author[post.author_id].append(
+                (post.pub_date.timestamp(), post.pk))
+    if not by_author:
+        return
+    entries = defaultdict(list)
+    for user_id, author_id in (
+            Follow.objects
+            .filter(author_id__in=by_author)
+            .values_list('user_id', 'author_id')):
+        entries[user_id].append(author_id)
+
+    locked = _lock(entries)
+    try:
+        cache.set_many(
+            {_stale_key(user_id): True
+             for user_id in entries.keys() - set(locked)},
+            settings.FOLLOW_FEED_AUTHOR_TIMEOUT
+        )
+        keys = {_timeline_key(user_id): user_id for user_id in locked}
+        timelines = cache.get_many(list(keys))
+        for key, timeline in timelines.items():
+            user_entries = sorted(
+                (entry
+                 for author_id in entries[keys[key]]
+                 if author_id in timeline['authors']
+                 for entry in by_author[author_id]),
+                reverse=True
+            )
+            _push(timeline, user_entries)
+        cache.set_many(timelines, settings.FOLLOW_FEED_AUTHOR_TIMEOUT)
+    finally:
+        _unlock(locked)
+
+
+def invalidate_timelines(*user_ids):
+    cache.delete_many([_timeline_key(user_id) for user_id in user_ids])
+
+
+def invalidate_follower_timelines(author_id):
+    invalidate_timelines(*Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+
+
+def merge(lists):
+    """Слияние списков по убыванию и граница, до которой оно достоверно.
+
+    У усечённого списка посты старше его последнего элемента не
+    хранятся, поэтому слиянию можно верить только до самого нового из
+    последних элементов усечённых списков. None - граница не нужна.
+    """
+    horizon = None
+    for author_list in lists:
+        posts = author_list['posts']
+        if not posts or author_list['count'] == len(posts):
+            continue
+        if horizon is None or posts[-1] > horizon:
+            horizon = posts[-1]
+    merged = heapq.merge(
+        *(author_list['posts'] for author_list in lists), reverse=True)
+    return merged, horizon
+
+
+class MergedFeed:
+    """Лента для Paginator: число постов и срезы без COUNT и сортировки.
+
+    queryset - та же лента в SQL, по ней строятся глубокие страницы.
+    """
+
+    def __init__(self, author_ids, queryset):
+        self.author_ids = author_ids
+        self.queryset = queryset.order_by('-pub_date', '-id')
+        self._lists = None
+
+    @property
+    def lists(self):
+        if self._lists is None:
+            self._lists = list(author_lists(self.author_ids).values())
+        return self._lists
+
+    def count(self):
+        return sum(author_list['count'] for author_list in self.lists)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if stop is None or stop > settings.FOLLOW_FEED_MERGE_DEPTH:
+            return list(self.queryset[index])
+
+        merged, horizon = merge(self.lists)
+        entries = list(islice(merged, start, stop))
+        if horizon is not None and (
+                len(entries) < stop - start or entries[-1] < horizon):
+            # страница заходит за конец усечённого списка
+            return list(self.queryset[index])
+
+        post_ids = [post_id for _, post_id in entries]
+        posts = (
+            Post.objects
+            .select_related('author')
+            .select_related('group')
+            .in_bulk(post_ids)
+        )
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+class HybridFeed(MergedFeed):
+    """Лента читателя плюс списки авторов, которые в неё не попадают."""
+
+    def __init__(self, user_id, author_ids, queryset):
+        super().__init__(author_ids, queryset)
+        self.user_id = user_id
+
+    @property
+    def lists(self):
+        if self._lists is None:
+            timeline = user_timeline(self.user_id, self.author_ids)
+            others = self.author_ids - timeline['authors']
+            self._lists = [timeline, *author_lists(others).values()]
+        return self._lists
+
+
+def follow_feed(user, author_ids, queryset):
+    """Лента подписок для Paginator выбранным FOLLOW_FEED_ENGINE способом.
+
+    author_ids - множество id авторов, на которых подписан user.
+    """
+    engine = settings.FOLLOW_FEED_ENGINE
+    if engine == ENGINE_MERGE:
+        return MergedFeed(author_ids, queryset)
+    if engine == ENGINE_HYBRID:
+        return HybridFeed(user.pk, author_ids, queryset)
+    return queryset
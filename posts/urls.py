@@ -1,24 +1,48 @@
 from django.conf.urls import handler404, handler500  # noqa
-from django.urls import path
+from django.urls import path, register_converter
 
-from . import views
+from . import feeds, views
+
+register_converter(feeds.FeedKindConverter, 'feed')
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('follow/', views.follow_index, name='follow_index'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
+    path('feeds/<feed:kind>/', feeds.index_feed, name='index_feed'),
+    path(
+        'group/<slug:slug>/<feed:kind>/',
+        feeds.group_feed, name='group_feed'
+    ),
     path('new/', views.new_post, name='new_post'),
+    path('drafts/', views.drafts, name='drafts'),
     path('<str:username>/', views.profile, name='profile'),
+    path(
+        '<str:username>/<feed:kind>/',
+        feeds.profile_feed, name='profile_feed'
+    ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/',
         views.post_edit, name='post_edit'
     ),
+    path(
+        '<str:username>/<int:post_id>/delete/',
+        views.post_delete, name='post_delete'
+    ),
     path(
         '<username>/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        '<str:username>/<int:post_id>/like/',
+        views.post_like, name='post_like'
+    ),
+    path(
+        '<str:username>/<int:post_id>/unlike/',
+        views.post_unlike, name='post_unlike'
+    ),
     path(
         '<str:username>/follow/',
         views.profile_follow,
@@ -0,0 +1,50 @@
+"""Кэш соответствия имени пользователя и его id.
+
+Почти все адреса постов и профилей содержат имя автора. С id из кэша
+пост читается по первичному ключу, а принадлежность автору проверяется
+сравнением author_id, без соединения с auth_user. Отсутствующие имена
+тоже кэшируются, но только на USERNAME_MISSING_TIMEOUT; записи
+сбрасываются при создании, переименовании и удалении пользователя
+(сигналы User).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import User
+
+# отметка «такого пользователя нет»: None кэш не отличит от промаха
+MISSING = 0
+
+
+def _key(username):
+    return f'username_id:{username}'
+
+
+def user_id(username):
+    """id пользователя с таким именем или None."""
+    key = _key(username)
+    cached = cache.get(key)
+    if cached is None:
+        cached = (
+            User.objects
+            .filter(username=username)
+            .values_list('pk', flat=True)
+            .first()
+        ) or MISSING
+        cache.set(key, cached, (
+            settings.USERNAME_CACHE_TIMEOUT if cached
+            else settings.USERNAME_MISSING_TIMEOUT
+        ))
+    return cached or None
+
+
+def user_id_or_404(username):
+    pk = user_id(username)
+    if pk is None:
+        raise Http404
+    return pk
+
+
+def invalidate(*usernames):
+    cache.delete_many([_key(username) for username in usernames])
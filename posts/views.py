@@ -1,14 +1,18 @@
-from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import Page
+from django.db.models import F, Q
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
 
-from .forms import CommentForm, PostForm
+from . import (deletion, follows, likes, notifications, timeline,
+               usernames, writebehind)
+from .forms import CommentForm, PostForm, PublishForm
 from .models import Follow, Group, Post
-
-POSTS_PER_PAGE = 10
-
-User = get_user_model()
+from .paginator import (FEED_INDEX, POSTS_PER_PAGE, feed_count, group_feed,
+                        make_paginator, page_window)
+from .snapshots import get_snapshot
 
 
 def page_not_found(request, exception):
@@ -24,25 +28,36 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
-def _prepare_post_content(post_query, page_number):
-    paginator = Paginator(post_query, POSTS_PER_PAGE)
+def _prepare_post_content(post_query, page_number, feed=None,
+                          estimate=False):
+    count = feed_count(post_query, feed, estimate)
+    paginator = make_paginator(post_query, POSTS_PER_PAGE, count)
     page = paginator.get_page(page_number)
-    return {'page': page, 'paginator': paginator}
+    return {
+        'page': page,
+        'paginator': paginator,
+        'page_range': page_window(page),
+    }
 
 
-def _prepare_profile_content(profile_user, guest_user=None):
-    post_count = profile_user.posts.all().count()
-    follower_count = profile_user.follower.all().count()
-    following_count = profile_user.following.all().count()
+def _prepare_profile_content(snapshot, guest_user=None):
+    profile_user = snapshot['user']
+    following_count = snapshot['following_count']
 
     following = False
     if guest_user is not None and guest_user.is_authenticated:
-        following = guest_user.follower.filter(author=profile_user).exists()
+        following = follows.is_following(guest_user, profile_user.pk)
+
+        # пользователь видит свои ещё не записанные подписки
+        pending = writebehind.pending_follows(guest_user).get(profile_user.pk)
+        if pending is not None and pending != following:
+            following_count += 1 if pending else -1
+            following = pending
 
     context = {
-        'post_count': post_count,
+        'post_count': snapshot['post_count'],
         'profile_user': profile_user,
-        'follower_count': follower_count,
+        'follower_count': snapshot['follower_count'],
         'following_count': following_count,
         'following': following,
     }
@@ -58,7 +73,8 @@ def index(request):
         .all()
     )
 
-    context = _prepare_post_content(post_query, page_number)
+    context = _prepare_post_content(
+        post_query, page_number, FEED_INDEX, estimate=True)
 
     return render(
         request,
@@ -79,7 +95,8 @@ def group_posts(request, slug):
     )
 
     context = {'group': group}
-    context.update(_prepare_post_content(group_posts, page_number))
+    context.update(_prepare_post_content(
+        group_posts, page_number, group_feed(group.pk)))
 
     return render(request, 'group.html', context)
 
@@ -87,28 +104,66 @@ def group_posts(request, slug):
 def profile(request, username):
     page_number = request.GET.get('page')
 
-    user = get_object_or_404(User, username=username)
+    snapshot = get_snapshot(username)
+    if snapshot is None:
+        raise Http404
+    user = snapshot['user']
     post_list = user.posts.select_related(
         'author').select_related('group').all()
 
-    context = _prepare_post_content(post_list, page_number)
-    context.update(_prepare_profile_content(user, request.user))
+    paginator = make_paginator(
+        post_list, POSTS_PER_PAGE, snapshot['post_count'])
+    page = paginator.get_page(page_number)
+    if page.number == 1:
+        # первая страница уже лежит в снимке
+        page = Page(snapshot['posts'], 1, paginator)
+
+    context = {
+        'page': page,
+        'paginator': paginator,
+        'page_range': page_window(page),
+    }
+    context.update(_prepare_profile_content(snapshot, request.user))
 
     return render(request, 'posts/profile.html', context)
 
 
+def _get_post(username, post_id, user=None):
+    """Пост по первичному ключу, автор сверяется по id из кэша имён.
+
+    Черновики и отложенные посты находятся, только если user - автор.
+    """
+    author_id = usernames.user_id_or_404(username)
+    posts = Post.objects
+    if user is not None and user.pk == author_id:
+        posts = Post.all_objects.alive()
+    post = get_object_or_404(posts.select_related('group'), pk=post_id)
+    if post.author_id != author_id:
+        raise Http404
+    return post
+
+
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = _get_post(username, post_id, request.user)
+    snapshot = get_snapshot(username)
+    if snapshot is None:
+        raise Http404
+    # автор уже есть в снимке профиля
+    post.author = snapshot['user']
 
     comments = post.comments.all()
+    pending_comments = writebehind.pending_comments(request.user, post)
+    if pending_comments:
+        comments = pending_comments + list(comments)
     comment_form = CommentForm()
 
     context = {
         'post': post,
         'comment_form': comment_form,
         'comments': comments,
+        'liked': likes.is_liked(request.user, post),
     }
-    context.update(_prepare_profile_content(post.author, request.user))
+    context.update(_prepare_profile_content(snapshot, request.user))
 
     return render(request, 'posts/post_view.html', context)
 
@@ -117,26 +172,46 @@ def post_view(request, username, post_id):
 def new_post(request):
     if request.method == 'POST':
         form = PostForm(request.POST, files=request.FILES or None)
-        if form.is_valid():
+        publish_form = PublishForm(request.POST)
+        if form.is_valid() and publish_form.is_valid():
             form.instance.author = request.user
-            form.save()
+            publish_form.apply(form.instance)
+            post = form.save()
+            if not post.published:
+                return redirect('drafts')
             return redirect('index')
 
         return render(
             request,
             'posts/new.html',
-            {'form': form, 'new_post': True}
+            {'form': form, 'publish_form': publish_form, 'new_post': True}
         )
 
     form = PostForm()
-    return render(request, 'posts/new.html', {'form': form, 'new_post': True})
+    return render(
+        request,
+        'posts/new.html',
+        {'form': form, 'publish_form': PublishForm(), 'new_post': True}
+    )
+
+
+@login_required
+def drafts(request):
+    posts = (
+        Post.all_objects
+        .alive()
+        .filter(author=request.user, published=False)
+        .select_related('group')
+        .order_by(F('scheduled_at').asc(nulls_last=True), '-pub_date')
+    )
+    return render(request, 'posts/drafts.html', {'posts': posts})
 
 
 @login_required
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = _get_post(username, post_id, request.user)
 
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('post', username, post_id)
 
     form = PostForm(
@@ -144,31 +219,60 @@ def post_edit(request, username, post_id):
         files=request.FILES or None,
         instance=post
     )
+    # опубликованный пост нельзя вернуть в черновики
+    publish_form = None
+    if not post.published:
+        publish_form = PublishForm(
+            request.POST or None,
+            initial={
+                'draft': post.scheduled_at is None,
+                'publish_at': post.scheduled_at,
+            }
+        )
 
-    if form.is_valid():
+    if form.is_valid() and (publish_form is None or publish_form.is_valid()):
+        if publish_form is not None:
+            publish_form.apply(post)
         form.save()
         return redirect('post', username, post_id)
 
     return render(
         request,
         'posts/post_edit.html',
-        {'post': post, 'form': form}
+        {'post': post, 'form': form, 'publish_form': publish_form}
     )
 
 
+@login_required
+def post_delete(request, username, post_id):
+    post = _get_post(username, post_id, request.user)
+
+    if post.author_id != request.user.pk:
+        return redirect('post', username, post_id)
+
+    if request.method == 'POST':
+        # комментарии и картинку удалит purge_deleted_posts
+        deletion.soft_delete(post)
+        return redirect('profile', username)
+
+    return render(request, 'posts/post_delete.html', {'post': post})
+
+
 @login_required
 def add_comment(request, username, post_id):
     if request.method == 'POST':
         form = CommentForm(request.POST)
         if not form.is_valid():
-            redirect('post', username=username, post_id=post_id)
+            return redirect('post', username=username, post_id=post_id)
+
+        post = _get_post(username, post_id)
+        if writebehind.is_enabled():
+            writebehind.push_comment(
+                request.user, post.pk, form.cleaned_data['text'])
+            return redirect('post', username=username, post_id=post_id)
 
         form.instance.author = request.user
-        form.instance.post = get_object_or_404(
-            Post,
-            id=post_id,
-            author__username=username
-        )
+        form.instance.post = post
         form.save()
         return redirect('post', username=username, post_id=post_id)
 
@@ -176,19 +280,71 @@ def add_comment(request, username, post_id):
     return redirect('post', username=username, post_id=post_id)
 
 
+@login_required
+def post_like(request, username, post_id):
+    if request.method == 'POST':
+        likes.like(request.user, _get_post(username, post_id))
+    return redirect('post', username=username, post_id=post_id)
+
+
+@login_required
+def post_unlike(request, username, post_id):
+    if request.method == 'POST':
+        likes.unlike(request.user, _get_post(username, post_id))
+    return redirect('post', username=username, post_id=post_id)
+
+
+def _followed_authors(user):
+    """id авторов из подписок и условие на ленту из их постов."""
+    author_ids = set(follows.followed_author_ids(user.pk))
+    pending = writebehind.pending_follows(user)
+    added = {author_id for author_id, on in pending.items() if on}
+    removed = set(pending) - added
+    author_ids = (author_ids | added) - removed
+
+    if len(author_ids) <= settings.FOLLOW_SET_IN_LIMIT:
+        return author_ids, Q(author_id__in=author_ids)
+
+    # слишком длинный список параметров: подписки берём подзапросом
+    condition = Q(author_id__in=Follow.objects.filter(
+        user=user).values('author_id'))
+    if added:
+        condition |= Q(author_id__in=added)
+    if removed:
+        condition &= ~Q(author_id__in=removed)
+    return author_ids, condition
+
+
 @login_required
 def follow_index(request):
+    author_ids, condition = _followed_authors(request.user)
     post_query = (
         Post.objects
         .select_related('author')
         .select_related('group')
-        .filter(author__following__user=request.user)
+        .filter(condition)
     )
 
-    context = {'follower': request.user}
+    # посты новее отметки прошлого визита отделяются в ленте чертой
+    now = timezone.now()
+    last_seen = notifications.seen_at(request.user)
+    new_count = post_query.filter(pub_date__gt=last_seen).count()
+
+    context = {
+        'follower': request.user,
+        'last_seen': last_seen,
+        'new_count': new_count,
+    }
 
     page_number = request.GET.get('page')
-    context.update(_prepare_post_content(post_query, page_number))
+    feed = timeline.follow_feed(request.user, author_ids, post_query)
+    context.update(_prepare_post_content(feed, page_number))
+    for post in context['page']:
+        post.is_new = post.pub_date > last_seen
+
+    # отметка сдвигается, когда новые посты показаны в начале ленты
+    if new_count and context['page'].number == 1:
+        notifications.mark_seen(request.user, now)
 
     return render(request, "posts/follow.html", context)
 
@@ -196,14 +352,18 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     # нельзя подписываться на несуществующего пользователя
-    author = get_object_or_404(User, username=username)
+    author_id = usernames.user_id_or_404(username)
 
     # нельзя подписываться на самого себя
-    if author == request.user:
+    if author_id == request.user.pk:
+        return redirect('profile', username=username)
+
+    if writebehind.is_enabled():
+        writebehind.push_follow(request.user, author_id)
         return redirect('profile', username=username)
 
     Follow.objects.get_or_create(
-        author=author,
+        author_id=author_id,
         user=request.user
     )
 
@@ -213,12 +373,22 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     # нельзя отписываться от несуществующего пользователя
-    author = get_object_or_404(User, username=username)
+    author_id = usernames.user_id_or_404(username)
+
+    if writebehind.is_enabled():
+        following = writebehind.pending_follows(request.user).get(author_id)
+        if following is None:
+            following = follows.is_following(request.user, author_id)
+        # нельзя отписаться от несуществующей подписки
+        if not following:
+            raise Http404
+        writebehind.push_unfollow(request.user, author_id)
+        return redirect('profile', username=username)
 
     # нельзя отписаться от несуществующей подписки
     follow = get_object_or_404(
         Follow,
-        author=author,
+        author_id=author_id,
         user=request.user
     )
     follow.delete()
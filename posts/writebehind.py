@@ -0,0 +1,285 @@
+"""Отложенная запись комментариев и подписок.
+
+Операции складываются в локальную очередь (отдельный файл SQLite) и
+применяются к основной базе пачками командой apply_write_behind.
+Ключ операции идемпотентен: повторная подписка или отписка того же
+пользователя от того же автора заменяет предыдущую запись в очереди,
+так что применяется только последнее состояние. Комментарии сохраняются
+с ключом операции, поэтому повторное применение пачки после сбоя до
+подтверждения не создаёт дубликатов.
+"""
+import json
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from contextlib import closing
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import follows as followsets
+from . import pagecache, snapshots, timeline
+from .models import Comment, Follow, Post, User
+
+OP_COMMENT = 'comment'
+OP_FOLLOW = 'follow'
+OP_UNFOLLOW = 'unfollow'
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS operations ('
+    ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' key TEXT NOT NULL UNIQUE,'
+    ' user_id INTEGER NOT NULL,'
+    ' op TEXT NOT NULL,'
+    ' payload TEXT NOT NULL,'
+    ' created REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS operations_user ON operations (user_id)',
+)
+
+
+def is_enabled():
+    return getattr(settings, 'WRITE_BEHIND_ENABLED', False)
+
+
+class WriteBehindQueue:
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            connection.execute('PRAGMA journal_mode = wal')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._ready = True
+        return closing(connection)
+
+    def push(self, key, user_id, op, payload):
+        # INSERT OR REPLACE выдаёт новый seq, так что повторная операция
+        # с тем же ключом встаёт в конец очереди
+        with self._connect() as connection, connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO operations '
+                '(key, user_id, op, payload, created) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, user_id, op, json.dumps(payload), time.time())
+            )
+
+    def pending_for_user(self, user_id):
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT seq, key, op, payload, created FROM operations '
+                'WHERE user_id = ? ORDER BY seq',
+                (user_id,)
+            ).fetchall()
+        return [_row_to_operation(row, user_id) for row in rows]
+
+    def take(self, limit):
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT seq, key, op, payload, created, user_id '
+                'FROM operations ORDER BY seq LIMIT ?',
+                (limit,)
+            ).fetchall()
+        return [_row_to_operation(row[:5], row[5]) for row in rows]
+
+    def ack(self, seqs):
+        # операции, заменённые за время применения, получили новый seq
+        # и останутся в очереди
+        with self._connect() as connection, connection:
+            connection.executemany(
+                'DELETE FROM operations WHERE seq = ?',
+                ((seq,) for seq in seqs)
+            )
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute(
+                'SELECT COUNT(*) FROM operations').fetchone()[0]
+
+
+def _row_to_operation(row, user_id):
+    seq, key, op, payload, created = row
+    operation = json.loads(payload)
+    operation.update(
+        seq=seq, key=key, op=op, user_id=user_id, created=created)
+    return operation
+
+
+_queues = {}
+
+
+def get_queue():
+    path = settings.WRITE_BEHIND_QUEUE_PATH
+    if path not in _queues:
+        _queues[path] = WriteBehindQueue(path)
+    return _queues[path]
+
+
+def _follow_key(user_id, author_id):
+    return f'follow:{user_id}:{author_id}'
+
+
+def push_comment(user, post_id, text):
+    get_queue().push(
+        f'comment:{uuid.uuid4().hex}',
+        user.pk,
+        OP_COMMENT,
+        {'post_id': post_id, 'text': text}
+    )
+
+
+def push_follow(user, author_id):
+    get_queue().push(
+        _follow_key(user.pk, author_id),
+        user.pk,
+        OP_FOLLOW,
+        {'author_id': author_id}
+    )
+
+
+def push_unfollow(user, author_id):
+    get_queue().push(
+        _follow_key(user.pk, author_id),
+        user.pk,
+        OP_UNFOLLOW,
+        {'author_id': author_id}
+    )
+
+
+def pending_follows(user):
+    """Отложенные подписки пользователя: {author_id: подписан ли}."""
+    if not is_enabled() or not user.is_authenticated:
+        return {}
+    return {
+        operation['author_id']: operation['op'] == OP_FOLLOW
+        for operation in get_queue().pending_for_user(user.pk)
+        if operation['op'] in (OP_FOLLOW, OP_UNFOLLOW)
+    }
+
+
+def pending_comments(user, post):
+    """Ещё не записанные комментарии пользователя к посту, новые первыми."""
+    if not is_enabled() or not user.is_authenticated:
+        return []
+    comments = [
+        Comment(
+            author=user,
+            post=post,
+            text=operation['text'],
+            created=datetime.fromtimestamp(
+                operation['created'], tz=timezone.utc),
+        )
+        for operation in get_queue().pending_for_user(user.pk)
+        if operation['op'] == OP_COMMENT
+        and operation['post_id'] == post.pk
+    ]
+    comments.reverse()
+    return comments
+
+
+def apply_pending(queue=None, batch_size=None):
+    """Применяет одну пачку операций, возвращает их количество."""
+    queue = queue or get_queue()
+    batch_size = batch_size or settings.WRITE_BEHIND_BATCH_SIZE
+    operations = queue.take(batch_size)
+    if not operations:
+        return 0
+
+    # пользователей и посты могли удалить, пока операция ждала в очереди;
+    # такие операции пропускаются, иначе пачка не применится никогда
+    user_ids = set()
+    for operation in operations:
+        user_ids.add(operation['user_id'])
+        if 'author_id' in operation:
+            user_ids.add(operation['author_id'])
+    existing_users = set(
+        User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    existing_posts = set(
+        Post.objects
+        .filter(pk__in={
+            operation['post_id'] for operation in operations
+            if operation['op'] == OP_COMMENT
+        })
+        .values_list('pk', flat=True)
+    )
+
+    follows = []
+    unfollows = defaultdict(list)
+    comments = []
+    for operation in operations:
+        if operation['user_id'] not in existing_users:
+            continue
+        if operation['op'] == OP_FOLLOW:
+            if operation['author_id'] in existing_users:
+                follows.append(Follow(
+                    user_id=operation['user_id'],
+                    author_id=operation['author_id']
+                ))
+        elif operation['op'] == OP_UNFOLLOW:
+            unfollows[operation['user_id']].append(operation['author_id'])
+        elif operation['op'] == OP_COMMENT:
+            if operation['post_id'] in existing_posts:
+                comments.append(operation)
+
+    with transaction.atomic():
+        if follows:
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        for user_id, author_ids in unfollows.items():
+            Follow.objects.filter(
+                user_id=user_id, author_id__in=author_ids).delete()
+        Comment.objects.bulk_create([
+            Comment(
+                author_id=comment['user_id'],
+                post_id=comment['post_id'],
+                text=comment['text'],
+                operation_key=comment['key'],
+            )
+            for comment in comments
+        ], ignore_conflicts=True)
+
+    queue.ack([operation['seq'] for operation in operations])
+
+    # bulk-операции не отправляют сигналы, кэши сбрасываем сами
+    _invalidate_caches(
+        follows, unfollows, {comment['post_id'] for comment in comments})
+    return len(operations)
+
+
+def _invalidate_caches(follows, unfollows, post_ids):
+    follower_ids = set(unfollows)
+    user_ids = set(unfollows)
+    for follow in follows:
+        follower_ids.add(follow.user_id)
+        user_ids.update((follow.user_id, follow.author_id))
+    for author_ids in unfollows.values():
+        user_ids.update(author_ids)
+
+    followsets.invalidate(*follower_ids)
+    timeline.invalidate_timelines(*follower_ids)
+    usernames = set(
+        User.objects.filter(pk__in=user_ids).values_list(
+            'username', flat=True)
+    )
+    # число комментариев выводится в снимках профилей авторов постов
+    post_rows = set(
+        Post.objects.filter(pk__in=post_ids).values_list(
+            'author__username', 'group__slug')
+    )
+    snapshots.invalidate(
+        *usernames, *(username for username, _ in post_rows))
+
+    if not pagecache.is_enabled():
+        return
+    scopes = set(map(pagecache.author_scope, usernames))
+    for username, slug in post_rows:
+        scopes.add(pagecache.SCOPE_INDEX)
+        scopes.add(pagecache.author_scope(username))
+        if slug:
+            scopes.add(pagecache.group_scope(slug))
+    pagecache.purge(*scopes)
@@ -0,0 +1,124 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+SENDFILE_ACCEL = 'x-accel-redirect'
+SENDFILE_APACHE = 'x-sendfile'
+
+
+def _parse_range(header, size):
+    """Возвращает (start, end) включительно или None для всего файла.
+
+    Поддерживается только один диапазон; несколько диапазонов и
+    некорректный заголовок отдают файл целиком, как разрешает RFC 7233.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500: последние 500 байт
+        length = int(end)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as media_file:
+        media_file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = media_file.read(min(BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(path, name, content_type):
+    # файл отдаст прокси; диапазоны и условные запросы он обработает сам.
+    # Имена загрузок могут быть не-ASCII, а заголовок - только ASCII:
+    # nginx и mod_xsendfile раскодируют %XX в пути сами
+    response = HttpResponse(content_type=content_type)
+    mode = settings.MEDIA_SENDFILE_MODE
+    if mode == SENDFILE_ACCEL:
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_SENDFILE_PREFIX + name)
+    else:
+        response['X-Sendfile'] = quote(path)
+    return response
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE_MODE in (SENDFILE_ACCEL, SENDFILE_APACHE):
+        return _sendfile_response(full_path, path, content_type)
+
+    stat = os.stat(full_path)
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size):
+        return HttpResponseNotModified()
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range == last_modified):
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    if byte_range is None:
+        # FileResponse отдаётся через wsgi.file_wrapper (sendfile у сервера)
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,262 @@
+"""Профилирование в рабочем окружении, включается PROFILING_ENABLED.
+
+Отдельный запрос профилируется cProfile, если у него есть заголовок
+X-Profile и он пришёл от сотрудника (is_staff) или с PROFILING_TOKEN;
+результат сохраняется в PROFILING_DIR. Семплирующий профайлер
+(PROFILING_SAMPLER) раз в PROFILING_SAMPLE_INTERVAL секунд снимает стеки
+потоков, которые обрабатывают запросы, и копит их в формате collapsed
+stacks (flamegraph.pl, speedscope). Оба результата смотрятся в админке.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+PROFILE_SUFFIX = '.prof'
+SAMPLES_PREFIX = 'samples-'
+SAMPLES_SUFFIX = '.folded'
+UNSAFE_CHARS = re.compile(r'[^\w.-]+')
+
+
+def _profiling_dir():
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    return settings.PROFILING_DIR
+
+
+def _wants_profile(request):
+    header = request.META.get('HTTP_X_PROFILE')
+    if header is None:
+        return False
+    token = settings.PROFILING_TOKEN
+    if token and constant_time_compare(header, token):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def _profile_name(request, elapsed):
+    path = UNSAFE_CHARS.sub('_', request.path).strip('_') or 'index'
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return (
+        f'{stamp}-{request.method}-{path[:80]}-{elapsed * 1000:.0f}ms'
+        f'{PROFILE_SUFFIX}'
+    )
+
+
+def _frame_name(frame):
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}.{frame.f_code.co_name}'.replace(';', ':')
+
+
+def collapse(frame):
+    """Стек в формате collapsed stacks: от корня к листу через «;»."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Семплирующий профайлер для потоков, занятых запросами."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # сбрасывают и поток семплера, и запросы на скачивание стеков
+        self.flush_lock = threading.Lock()
+        self.threads = set()
+        self.counts = Counter()
+        self.thread = None
+        self.last_flush = time.monotonic()
+
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(
+                target=self._run, name='profiling-sampler', daemon=True)
+            self.thread.start()
+
+    def track(self, thread_id):
+        with self.lock:
+            self.threads.add(thread_id)
+
+    def untrack(self, thread_id):
+        with self.lock:
+            self.threads.discard(thread_id)
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self.lock:
+            threads = list(self.threads)
+        stacks = [
+            collapse(frames[thread_id])
+            for thread_id in threads if thread_id in frames
+        ]
+        with self.lock:
+            self.counts.update(stacks)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.PROFILING_SAMPLE_INTERVAL)
+            self.sample()
+            if (time.monotonic() - self.last_flush
+                    > settings.PROFILING_FLUSH_INTERVAL):
+                self.flush()
+
+    def flush(self):
+        """Добавляет накопленные стеки в файл процесса и обнуляет счётчик."""
+        with self.flush_lock:
+            self.last_flush = time.monotonic()
+            with self.lock:
+                counts, self.counts = self.counts, Counter()
+            if not counts:
+                return
+            # у каждого процесса свой файл, а внутри процесса чтение,
+            # слияние и запись идут под flush_lock
+            path = os.path.join(
+                _profiling_dir(),
+                f'{SAMPLES_PREFIX}{os.getpid()}{SAMPLES_SUFFIX}')
+            counts.update(read_folded(path))
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w') as folded:
+                for stack, count in counts.most_common():
+                    folded.write(f'{stack} {count}\n')
+            os.replace(tmp_path, path)
+
+
+sampler = Sampler()
+
+
+def read_folded(path):
+    counts = Counter()
+    if not os.path.exists(path):
+        return counts
+    with open(path) as folded:
+        for line in folded:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                counts[stack] += int(count)
+    return counts
+
+
+def collected_samples():
+    """Стеки всех процессов вместе."""
+    counts = Counter()
+    directory = settings.PROFILING_DIR
+    if not os.path.isdir(directory):
+        return counts
+    for name in os.listdir(directory):
+        if name.startswith(SAMPLES_PREFIX) and name.endswith(SAMPLES_SUFFIX):
+            counts.update(read_folded(os.path.join(directory, name)))
+    return counts
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        if settings.PROFILING_SAMPLER:
+            sampler.ensure_started()
+            sampler.track(thread_id)
+        try:
+            if not _wants_profile(request):
+                return self.get_response(request)
+            return self._profile(request)
+        finally:
+            sampler.untrack(thread_id)
+
+    def _profile(self, request):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        name = _profile_name(request, time.perf_counter() - start)
+        profiler.dump_stats(os.path.join(_profiling_dir(), name))
+        response['X-Profile-File'] = name
+        return response
+
+
+def _profile_path(name):
+    name = os.path.basename(name)
+    path = os.path.join(settings.PROFILING_DIR, name)
+    if not name.endswith(PROFILE_SUFFIX) or not os.path.isfile(path):
+        raise Http404
+    return path
+
+
+@staff_member_required
+def profiles(request):
+    directory = settings.PROFILING_DIR
+    names = []
+    if os.path.isdir(directory):
+        names = sorted(
+            (name for name in os.listdir(directory)
+             if name.endswith(PROFILE_SUFFIX)),
+            reverse=True,
+        )
+    samples = collected_samples()
+    return render(request, 'admin/profiling/index.html', {
+        **admin.site.each_context(request),
+        'title': 'Профилирование',
+        'enabled': settings.PROFILING_ENABLED,
+        'sampler': settings.PROFILING_SAMPLER,
+        'profiles': names,
+        'samples_total': sum(samples.values()),
+        'top_stacks': samples.most_common(20),
+    })
+
+
+@staff_member_required
+def profile_detail(request, name):
+    path = _profile_path(name)
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats(sort).print_stats(60)
+    return render(request, 'admin/profiling/detail.html', {
+        **admin.site.each_context(request),
+        'title': name,
+        'name': name,
+        'sort': sort,
+        'stats': output.getvalue(),
+    })
+
+
+@staff_member_required
+def profile_download(request, name):
+    with open(_profile_path(name), 'rb') as profile:
+        response = HttpResponse(
+            profile.read(), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
+
+
+@staff_member_required
+def samples_download(request):
+    # стеки, которые ещё не сброшены на диск этим процессом
+    sampler.flush()
+    lines = [
+        f'{stack} {count}\n'
+        for stack, count in collected_samples().most_common()
+    ]
+    response = HttpResponse(''.join(lines), content_type='text/plain')
+    response['Content-Disposition'] = 'attachment; filename="samples.folded"'
+    return response
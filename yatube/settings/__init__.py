@@ -0,0 +1,14 @@
+import os
+
+# набор настроек выбирается переменной окружения YATUBE_ENV (dev/prod)
+_environment = os.environ.get('YATUBE_ENV', 'dev')
+
+if _environment == 'prod':
+    from .prod import *  # noqa
+elif _environment == 'dev':
+    from .dev import *  # noqa
+else:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(
+        f'Неизвестное окружение YATUBE_ENV={_environment!r}'
+    )
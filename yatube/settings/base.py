@@ -0,0 +1,245 @@
+import os
+
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
+
+
+INSTALLED_APPS = [
+    'posts.apps.PostsConfig',
+    'users',
+    'sorl.thumbnail',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'django.contrib.sites',
+    'django.contrib.flatpages',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'posts.pagecache.AnonymousPageCacheMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.profiling.ProfilingMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'posts.context_processors.notifications',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'DJANGO_DB_NAME',
+            os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+    }
+}
+
+# применяются к каждому новому соединению с SQLite (см. posts/db.py)
+SQLITE_PRAGMAS = {
+    # читатели не блокируют писателя и наоборот
+    'journal_mode': 'wal',
+    # в режиме WAL fsync нужен только на checkpoint
+    'synchronous': 'normal',
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # отрицательное значение - размер в килобайтах
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+    # ждать освобождения блокировки вместо 'database is locked'
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+}
+
+# отложенная запись комментариев и подписок (см. posts/writebehind.py)
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED') == '1'
+WRITE_BEHIND_QUEUE_PATH = os.environ.get(
+    'WRITE_BEHIND_QUEUE_PATH',
+    os.path.join(BASE_DIR, 'write_behind.sqlite3')
+)
+WRITE_BEHIND_BATCH_SIZE = 500
+
+# счётчики записей в лентах кэшируются и сбрасываются при записи постов
+PAGINATOR_COUNT_TIMEOUT = 60 * 60
+# больше этого числа постов индекс считается по оценке, а не COUNT(*)
+PAGINATOR_ESTIMATE_THRESHOLD = 100000
+# сколько соседних страниц показывать вокруг текущей
+PAGINATOR_WINDOW = 2
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# защита кэша лент от одновременной перестройки (см. posts/feedcache.py):
+# сколько секунд отдавать устаревшее значение, пока его перестраивают
+FEED_CACHE_STALE_TIMEOUT = 60
+# сколько держится блокировка перестройки
+FEED_CACHE_LOCK_TIMEOUT = 10
+# сколько ждать чужой перестройки, если в кэше ничего нет
+FEED_CACHE_WAIT_TIMEOUT = 1
+# коэффициент раннего истечения срока, 0 - выключено
+FEED_CACHE_BETA = 1.0
+
+# снимки профилей, множества подписок и id по именам обновляются при записи,
+# срок жизни только страхует от забытых сбросов
+PROFILE_SNAPSHOT_TIMEOUT = 24 * 60 * 60
+FOLLOW_SET_TIMEOUT = 24 * 60 * 60
+USERNAME_CACHE_TIMEOUT = 24 * 60 * 60
+# отсутствующие имена (опечатки, перебор адресов) держатся недолго
+USERNAME_MISSING_TIMEOUT = 60
+# до скольких подписок лента строится как author_id IN (...)
+FOLLOW_SET_IN_LIMIT = 500
+
+# лента подписок: sql - один запрос с сортировкой по всем авторам,
+# merge - слияние коротких списков постов каждого автора,
+# hybrid - см. FOLLOW_FANOUT_THRESHOLD
+FOLLOW_FEED_ENGINE = os.environ.get('FOLLOW_FEED_ENGINE', 'sql')
+# сколько последних постов автора хранить для слияния
+FOLLOW_FEED_AUTHOR_POSTS = 100
+FOLLOW_FEED_AUTHOR_TIMEOUT = 24 * 60 * 60
+# глубже этой позиции в ленте страницы строятся через SQL
+FOLLOW_FEED_MERGE_DEPTH = 200
+# hybrid - как merge, но посты авторов с числом подписчиков меньше
+# FOLLOW_FANOUT_THRESHOLD заранее раскладываются по лентам читателей
+FOLLOW_FANOUT_THRESHOLD = int(
+    os.environ.get('FOLLOW_FANOUT_THRESHOLD', 1000))
+# как часто пересчитывать, кто из авторов выше порога
+FOLLOW_FANOUT_RECHECK = 5 * 60
+# сколько постов хранить в ленте читателя
+FOLLOW_FEED_TIMELINE_POSTS = 200
+
+# сколько секунд кэшируется число непрочитанных постов подписок
+NOTIFICATION_UNREAD_TIMEOUT = 60
+# по скольку пользователей обрабатывает send_digests за раз
+NOTIFICATION_DIGEST_BATCH_SIZE = 500
+
+# удалённые посты скрываются сразу, а комментарии и файлы удаляет
+# purge_deleted_posts: столько комментариев в одной транзакции
+POST_PURGE_BATCH_SIZE = 1000
+
+# отложенные посты публикует publish_scheduled: столько постов за пачку,
+# кэши обновляются один раз на пачку
+POST_PUBLISH_BATCH_SIZE = 500
+
+# лайки копятся в LikeDelta, flush_likes переносит в счётчики постов
+# столько изменений за транзакцию
+LIKE_FLUSH_BATCH_SIZE = 1000
+
+# профилирование (см. yatube/profiling.py): cProfile для запросов с
+# заголовком X-Profile от сотрудников или с PROFILING_TOKEN и семплы стеков
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_SAMPLER = os.environ.get('PROFILING_SAMPLER') == '1'
+PROFILING_DIR = os.environ.get(
+    'PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_SAMPLE_INTERVAL = 0.01
+# как часто семплы сбрасываются на диск, в секундах
+PROFILING_FLUSH_INTERVAL = 10
+
+# время жизни страниц в кэше для анонимов, 0 - кэш выключен
+ANONYMOUS_PAGE_CACHE_TIMEOUT = int(
+    os.environ.get('ANONYMOUS_PAGE_CACHE_TIMEOUT', 0))
+# сколько хранится поколение области кэша страниц; не меньше времени
+# жизни страниц, иначе ключи запросов к несуществующим адресам копятся
+PAGE_CACHE_GENERATION_TIMEOUT = 60 * 60 * 24
+
+# хранилище сессий: db - запрос к базе на каждый запрос пользователя,
+# cached_db - чтение из общего кэша с записью в базу,
+# signed_cookies - сессия целиком в подписанной cookie, без базы и кэша
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', # noqa
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',  # noqa
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',  # noqa
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',  # noqa
+    },
+]
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+STATIC_WSGI_HANDLER = False
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# None - файлы отдаёт Django (FileResponse и Range),
+# 'x-accel-redirect' (nginx) или 'x-sendfile' (apache) - отдаёт прокси
+MEDIA_SENDFILE_MODE = os.environ.get('MEDIA_SENDFILE_MODE') or None
+# internal location в nginx, указывающий на MEDIA_ROOT
+MEDIA_SENDFILE_PREFIX = os.environ.get(
+    'MEDIA_SENDFILE_PREFIX', '/protected-media/')
+
+LOGIN_URL = '/auth/login/'
+LOGIN_REDIRECT_URL = 'index'
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+SITE_ID = 1
@@ -0,0 +1,29 @@
+from .base import *  # noqa
+
+ENVIRONMENT = 'dev'
+
+SECRET_KEY = SECRET_KEY or '9%-4b(!tfaz46u4fjnr$^so!byxo)rijjecrhq%pvz3jmbdig0'  # noqa
+
+DEBUG = True
+
+ALLOWED_HOSTS = [
+        "localhost",
+        "127.0.0.1",
+        "[::1]",
+        "testserver",
+        '*',  # разрешить всем
+]
+
+# новые списки, а не +=: списки из base общие с другими наборами настроек
+INSTALLED_APPS = INSTALLED_APPS + [  # noqa
+    'debug_toolbar',
+]
+
+MIDDLEWARE = MIDDLEWARE + [  # noqa
+    'debug_toolbar.middleware.DebugToolbarMiddleware',
+]
+
+# django-debug-toolbar
+INTERNAL_IPS = [
+    "127.0.0.1",
+]
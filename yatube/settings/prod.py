@@ -0,0 +1,58 @@
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa
+
+ENVIRONMENT = 'prod'
+
+if not SECRET_KEY:  # noqa
+    raise ImproperlyConfigured('Не задана переменная DJANGO_SECRET_KEY')
+
+DEBUG = False
+
+# сессии читаются из общего кэша, база - только при промахе
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]  # noqa
+
+# CACHE_BACKEND должен указывать на общий кэш (memcached, redis): кэши
+# сбрасываются при записи, а LocMemCache у каждого процесса свой
+# (проверка posts.W004)
+ANONYMOUS_PAGE_CACHE_TIMEOUT = int(
+    os.environ.get('ANONYMOUS_PAGE_CACHE_TIMEOUT', 300))
+
+# постоянные соединения с базой вместо нового подключения на каждый запрос;
+# словари из base копируются: они общие с другими наборами настроек
+DATABASES = copy.deepcopy(DATABASES)  # noqa
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.environ.get('DJANGO_CONN_MAX_AGE', 600)
+)
+
+# сжатие и условные ответы (ETag/Last-Modified -> 304) ставим до остальных
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
+] + MIDDLEWARE[1:]  # noqa
+
+# шаблоны компилируются один раз на процесс, а не на каждый рендер
+TEMPLATES = copy.deepcopy(TEMPLATES)  # noqa
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['debug'] = False
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor
+    for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.template.context_processors.debug'
+]
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# хэшированные имена и сжатые копии статики создаются при collectstatic
+STATICFILES_STORAGE = 'yatube.storage.CompressedManifestStaticFilesStorage'
+# статику отдаёт WSGI-обёртка из yatube/static.py, минуя Django
+STATIC_WSGI_HANDLER = True
@@ -0,0 +1,15 @@
+from .base import *  # noqa
+
+# выбирается manage.py test и pytest.ini; тестовая база SQLite создаётся
+# в памяти, у каждого процесса --parallel и pytest -n своя копия
+ENVIRONMENT = 'test'
+
+SECRET_KEY = SECRET_KEY or 'test-secret-key'  # noqa
+
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+# стойкий хэш пароля в тестах только тратит время
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# картинки из тестов не пишутся в MEDIA_ROOT
+DEFAULT_FILE_STORAGE = 'yatube.storage.InMemoryStorage'
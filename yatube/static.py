@@ -0,0 +1,172 @@
+"""WSGI-обёртка, отдающая собранную статику без участия Django.
+
+Список файлов STATIC_ROOT читается один раз при старте процесса; на
+запрос файл отдаётся через wsgi.file_wrapper (sendfile, если сервер
+его поддерживает), с готовой сжатой копией по Accept-Encoding.
+"""
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+# файлы с хэшем в имени не меняются, их можно кэшировать «навсегда»
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+BLOCK_SIZE = 64 * 1024
+
+
+def parse_accept_encoding(header):
+    """Кодировки из Accept-Encoding с их q: {'gzip': 1.0, '*': 0.0}."""
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def parse_etags(header):
+    """Теги из If-None-Match; слабое сравнение, поэтому без W/."""
+    tags = []
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        tag = f'{int(stat.st_mtime):x}-{stat.st_size:x}'
+        self.path = path
+        self.size = stat.st_size
+        self.etag = f'"{tag}"'
+        self.headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('Cache-Control', (
+                IMMUTABLE_CACHE_CONTROL if immutable
+                else DEFAULT_CACHE_CONTROL
+            )),
+        ]
+        # у сжатой копии другое тело, поэтому и свой ETag: иначе кэш
+        # может ответить 304 на запрос в другой кодировке
+        self.variants = {}
+        for encoding, extension in ENCODINGS:
+            compressed = path + extension
+            if os.path.isfile(compressed):
+                self.variants[encoding] = (
+                    compressed,
+                    os.stat(compressed).st_size,
+                    f'"{tag}-{extension[1:]}"',
+                )
+        if self.variants:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def select(self, accept_encoding):
+        """Путь, размер, кодировка и ETag копии с наибольшим q.
+
+        При равных q сжатые копии предпочтительнее, в порядке ENCODINGS.
+        Без кодировки файл отдаётся, даже если клиент отказался от
+        identity, но не принимает и ни одну из готовых копий.
+        """
+        qualities = parse_accept_encoding(accept_encoding)
+        default = qualities.get('*')
+        identity = qualities.get(
+            'identity', 1.0 if default is None or default > 0 else 0.0)
+        best = (self.path, self.size, None, self.etag)
+        best_quality = identity
+        for encoding, _ in ENCODINGS:
+            if encoding not in self.variants:
+                continue
+            quality = qualities.get(encoding, default or 0.0)
+            if quality <= 0 or quality < best_quality or (
+                    quality == best_quality and best[2] is not None):
+                continue
+            path, size, etag = self.variants[encoding]
+            best, best_quality = (path, size, encoding, etag), quality
+        return best
+
+
+def _hashed_names(root):
+    # staticfiles.json пишет ManifestStaticFilesStorage
+    try:
+        with open(os.path.join(root, 'staticfiles.json')) as manifest:
+            return set(json.load(manifest).get('paths', {}).values())
+    except (OSError, ValueError):
+        return set()
+
+
+def scan(root):
+    hashed = _hashed_names(root)
+    compressed = tuple(extension for _, extension in ENCODINGS)
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(compressed):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[name] = StaticFile(path, immutable=name in hashed)
+    return files
+
+
+class StaticFilesMiddleware:
+    def __init__(self, application, root, prefix):
+        self.application = application
+        self.prefix = prefix
+        self.files = scan(root) if os.path.isdir(root) else {}
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+
+        static_file = self.files.get(path[len(self.prefix):])
+        method = environ['REQUEST_METHOD']
+        if static_file is None or method not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+
+        path, size, encoding, etag = static_file.select(
+            environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if_none_match = parse_etags(environ.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            start_response(
+                '304 Not Modified', static_file.headers + [('ETag', etag)])
+            return []
+
+        headers = static_file.headers + [
+            ('ETag', etag), ('Content-Length', str(size))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
+
+
+def with_static_files(application):
+    from django.conf import settings
+
+    if not getattr(settings, 'STATIC_WSGI_HANDLER', False):
+        return application
+    return StaticFilesMiddleware(
+        application, settings.STATIC_ROOT, settings.STATIC_URL)
@@ -0,0 +1,137 @@
+import gzip
+import os
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен, без него будут только .gz
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.txt', '.html', '.json', '.xml',
+    '.eot', '.ttf', '.otf', '.ico',
+)
+# совсем маленькие файлы сжимать бессмысленно
+MIN_COMPRESS_SIZE = 256
+
+
+def _gzip(content):
+    # mtime=0, чтобы сжатый файл не менялся от сборки к сборке
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def _brotli(content):
+    return brotli.compress(content, mode=brotli.MODE_TEXT)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена файлов плюс готовые .gz и .br копии.
+
+    Сжатые копии создаются при collectstatic, так что во время запроса
+    статика отдаётся как есть, без сжатия на лету.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = set()
+        for name, hashed_name, result in super().post_process(
+                paths, dry_run, **options):
+            if hashed_name and not isinstance(result, Exception):
+                processed.add(hashed_name)
+            yield name, hashed_name, result
+
+        if dry_run:
+            return
+
+        for name in sorted(processed):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compressors(self):
+        compressors = [('gz', _gzip)]
+        if brotli is not None:
+            compressors.append(('br', _brotli))
+        return compressors
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+
+        for extension, compressor in self.compressors():
+            compressed = compressor(content)
+            # сжатие не всегда выигрывает, например для уже сжатых шрифтов
+            if len(compressed) >= len(content):
+                continue
+            compressed_path = f'{path}.{extension}'
+            with open(compressed_path, 'wb') as target:
+                target.write(compressed)
+            yield os.path.relpath(compressed_path, self.location)
+
+
+class InMemoryStorage(Storage):
+    """Медиафайлы в памяти процесса, для тестов: MEDIA_ROOT не трогается.
+
+    Файлы общие для всех экземпляров, поэтому sorl-thumbnail, который
+    создаёт своё хранилище, видит загруженные картинки.
+    """
+
+    files = {}
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url or settings.MEDIA_URL
+
+    def _open(self, name, mode='rb'):
+        try:
+            content, _ = self.files[name]
+        except KeyError:
+            raise FileNotFoundError(name)
+        return ContentFile(content, name=name)
+
+    def _save(self, name, content):
+        data = b''.join(
+            chunk.encode() if isinstance(chunk, str) else chunk
+            for chunk in content.chunks()
+        )
+        self.files[name] = (data, timezone.now())
+        return name
+
+    def delete(self, name):
+        self.files.pop(name, None)
+
+    def exists(self, name):
+        return name in self.files
+
+    def size(self, name):
+        return len(self.files[name][0])
+
+    def url(self, name):
+        return urljoin(self.base_url, filepath_to_uri(name))
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        directories, files = set(), []
+        for name in self.files:
+            if not name.startswith(prefix):
+                continue
+            head, _, tail = name[len(prefix):].partition('/')
+            if tail:
+                directories.add(head)
+            else:
+                files.append(head)
+        return sorted(directories), sorted(files)
+
+    def get_modified_time(self, name):
+        return self.files[name][1]
+
+    get_created_time = get_accessed_time = get_modified_time
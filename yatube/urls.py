@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.contrib.flatpages import views as flatpages_views
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from . import media, profiling
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
@@ -11,6 +13,22 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('django.contrib.flatpages.urls')),
+    path('admin/profiling/', profiling.profiles, name='profiling'),
+    path(
+        'admin/profiling/samples.folded',
+        profiling.samples_download,
+        name='profiling_samples'
+    ),
+    path(
+        'admin/profiling/<str:name>/',
+        profiling.profile_detail,
+        name='profiling_detail'
+    ),
+    path(
+        'admin/profiling/<str:name>/download/',
+        profiling.profile_download,
+        name='profiling_download'
+    ),
     path('admin/', admin.site.urls),
 ]
 
@@ -27,21 +45,23 @@ urlpatterns += [
         {'url': '/spec/'},
         name='about_author'),
 ]
-    
+
 urlpatterns += [
+    re_path(
+        r'^{}(?P<path>.+)$'.format(settings.MEDIA_URL.lstrip('/')),
+        media.serve,
+        name='media'
+    ),
     path('', include('posts.urls')),
 ]
 
 
 if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT
-    )
     urlpatterns += static(
         settings.STATIC_URL,
         document_root=settings.STATIC_ROOT
     )
 
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
     urlpatterns += (path("__debug__/", include(debug_toolbar.urls)),)